@@ -1,117 +1,55 @@
+import json
+import os
+
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.io as pio
-import re
-import base64
-import os
-from fpdf import FPDF
 
-# Configuración de imagen
-pio.kaleido.scope.default_format = "png"
-pio.kaleido.scope.default_width = 700
-pio.kaleido.scope.default_height = 500
+import core
+import jobs
+from charts import data_digest, get_renderer
+from compare import FIELDS as COMPARE_FIELDS, comparison_cache, comparison_table, squad_ranks
+from core import (
+    CHART_LIMITS, LABELS, LANGUAGES, LARGE_SQUAD, METRIC_DEFINITIONS, METRIC_GROUPS, METRICS, cached_bar_chart,
+    get_grouped_metrics, get_metric_definitions, get_metrics, group_averages, match_options, metric_label,
+    ordered_metrics, report_charts
+)
+from cube import TODOS, AggregateCube, cell_cache, table_cache
+from derived import available, derived_cache, with_derived
+from fatigue import FIELDS as HALF_FIELDS, half_rows, half_summary, half_table, profile_cache
+from ingest import MatchFrame, file_cache, ingest_files, set_parse_pool
+from jobs import get_queue, job_id
+from peaks import PEAK_METRICS, PEAK_WINDOWS, peak_table, peaks_cache, trace_cache
+from store import open_store
+from traces import open_trace_store
+from timings import MAX_HISTORIAL, RunTimings, history_frame
+from workload import METHODS, WORKLOAD_COLUMNS, WorkloadEngine
 
 st.set_page_config(layout="wide")
 
+# Los procesos "spawn" volverían a ejecutar este script (es el `__main__` de Streamlit): se parsea en hilos
+set_parse_pool("thread")
+
+# Tiempos por etapa de este rerun; panel con ?debug=1 o GPS_DEBUG=1 (ver timings.py)
+timings = RunTimings({
+    "ingesta": file_cache(),
+    "figuras": core.figure_cache(),
+    "imagenes": get_renderer().cache,
+    "trazas": trace_cache(),
+    "picos": peaks_cache(),
+    "celdas": cell_cache(),
+    "tablas": table_cache(),
+    "derivadas": derived_cache(),
+    "tiempos": profile_cache(),
+    "comparaciones": comparison_cache(),
+})
+debug = os.environ.get("GPS_DEBUG") == "1" or st.query_params.get("debug") == "1"
+
 # Idioma
-lang = st.sidebar.selectbox("Language / Idioma", ["English", "Español"])
-
-# Traducción de etiquetas
-labels = {
-    "English": {
-        "title": "Match GPS Report",
-        "upload": "Upload match CSV files",
-        "match": "Match",
-        "half": "Half",
-        "player": "Player",
-        "first_half": "First Half",
-        "second_half": "Second Half",
-        "all": "All",
-        "averages": "Player(s) Averages",
-        "distance": "Total Distance (m)",
-        "tempo": "Tempo Distance (m)",
-        "hsr": "HSR Distance (m)",
-        "sprint": "Sprint Distance (m)",
-        "sprint_count": "Number of Sprints",
-        "max_speed": "Max Speed (m/s)",
-        "acc": "Accelerations (#)",
-        "dec": "Decelerations (#)",
-        "load": "Player Load",
-        "rhie": "RHIE Count",
-        "create_pdf": "Generate PDF Report",
-        "download_pdf": "Download PDF Report",
-        "avg_of": "Average of",
-        "Carga": "Load",
-        "Velocidad e Intensidad": "Speed & Intensity",
-        "Aceleración y Desaceleración": "Acceleration & Deceleration",
-        "Distancias": "Distances",
-        "Esfuerzos Repetidos": "Repeated High-Intensity Efforts",
-        "pdf_title": "Team GPS Report",
-        "pdf_file": "gps_report.pdf",
-        "Fecha": "Date",
-        "Partido": "Match",
-        "Jugador": "Player"
-    },
-    "Español": {
-        "title": "Informe GPS del Partido",
-        "upload": "Sube archivos CSV del partido",
-        "match": "Partido",
-        "half": "Tiempo",
-        "player": "Jugador",
-        "first_half": "Primer Tiempo",
-        "second_half": "Segundo Tiempo",
-        "all": "Todos",
-        "averages": "Promedios del(los) Jugador(es)",
-        "distance": "Distancia Total (m)",
-        "tempo": "Distancia en Tempo (m)",
-        "hsr": "Distancia HSR (m)",
-        "sprint": "Distancia en Sprint (m)",
-        "sprint_count": "N° de Sprints",
-        "max_speed": "Velocidad Máxima (m/s)",
-        "acc": "Aceleraciones (#)",
-        "dec": "Desaceleraciones (#)",
-        "load": "Carga del Jugador",
-        "rhie": "Esfuerzos Repetidos Alta Intensidad",
-        "create_pdf": "Crear Informe PDF",
-        "download_pdf": "Descargar Informe PDF",
-        "avg_of": "Promedio de",
-        "Carga": "Carga",
-        "Velocidad e Intensidad": "Velocidad e Intensidad",
-        "Aceleración y Desaceleración": "Aceleración y Desaceleración",
-        "Distancias": "Distancias",
-        "Esfuerzos Repetidos": "Esfuerzos Repetidos",
-        "pdf_title": "Informe GPS del Equipo",
-        "pdf_file": "informe_gps.pdf",
-        "Fecha": "Fecha",
-        "Partido": "Partido",
-        "Jugador": "Jugador"
-    }
-}[lang]
-
-
-
-# Definiciones de métricas
-metric_definitions = {
-    labels["distance"]: "Total distance covered during the match.",
-    labels["tempo"]: "Distance covered at moderate intensity (~15–20 km/h).",
-    labels["hsr"]: "Distance covered between 20 and 25 km/h.",
-    labels["sprint"]: "Distance covered above 25 km/h.",
-    labels["sprint_count"]: "Number of sprints above 25 km/h lasting at least 1s.",
-    labels["max_speed"]: "Maximum speed reached during the match.",
-    labels["acc"]: "Number of effective accelerations (>1.5 m/s²).",
-    labels["dec"]: "Number of effective decelerations (<-1.5 m/s²).",
-    labels["load"]: "Cumulative load based on all movement intensities.",
-    labels["rhie"]: "Repeated high-intensity efforts (sprint, acc, dec).",
-    "Peak Player Load": "Maximum load recorded in a short period.",
-    "Player Load Work Time": "Total time under physical effort contributing to load.",
-    "Player Load Rest Time": "Total time of recovery or inactivity during the session.",
-    "Player Load Work:Rest": "Ratio between work time and rest time.",
-    "Velocity Exertion": "Effort exerted considering intensity and velocity changes.",
-    "Velocity Exertion Per Min": "Velocity-based exertion per minute of activity.",
-    "Acceleration Load": "Load accumulated from acceleration efforts.",
-    "Acceleration Density Index": "Frequency and density of acceleration actions."
-}
+lang = st.sidebar.selectbox("Language / Idioma", LANGUAGES)
+
+# Traducción de etiquetas y definiciones de métricas
+labels = LABELS[lang]
+metric_definitions = get_metric_definitions(labels)
 
 # Estilo neón
 st.markdown("""
@@ -141,214 +79,269 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Función de gráfico
-def neon_bar_chart(df, label, column):
-    fig = go.Figure(go.Bar(
-        x=df[column],
-        y=df['Player Name'],
-        orientation='h',
-        text=df[column].round(1),
-        textposition='outside',
-        marker=dict(color='rgba(255, 0, 51, 0.7)'),
-        hovertemplate=f'%{{y}}<br>{label}: %{{x}}<br>{metric_definitions.get(label, "")}'
-    ))
-    fig.update_layout(
-        height=400,
-        xaxis_title=label,
-        yaxis_title=labels["player"],
-        plot_bgcolor='#0d0d0d',
-        paper_bgcolor='#0d0d0d',
-        font=dict(color='white', size=12)
-    )
-    return fig
-
-def clean_text(text):
-    """Convierte el texto a latin-1 seguro, reemplazando caracteres Unicode no válidos."""
-    return str(text).encode('latin-1', errors='replace').decode('latin-1')
-
-
-# Función para crear PDF
-def generate_pdf(title, summary, avg_data, bar_charts=None):
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_fill_color(13, 13, 13)
-    pdf.rect(0, 0, 210, 297, 'F')
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, clean_text(title), ln=True, align='C')
-    pdf.ln(10)
-
-    pdf.set_font("Arial", size=12)
-    for k, v in summary.items():
-        k_translated = labels.get(k, k)
-        pdf.cell(0, 10, clean_text(f"{k_translated}: {v}"), ln=True, align='C')
-
-    for cat, items in avg_data.items():
-        pdf.ln(10)
-        pdf.set_font("Arial", 'B', 14)
-        pdf.cell(0, 10, clean_text(f"{labels['avg_of']} {cat}"), ln=True, align='C')
-        pdf.set_font("Arial", size=11)
-        for label, val in items:
-            pdf.cell(0, 8, clean_text(f"{label}: {val:.1f}"), ln=True, align='C')
-
-    if bar_charts:
-        for chart in bar_charts:
-            try:
-                path = chart.get("path")
-                title = chart.get("title")
-                if path and os.path.exists(path):
-                    pdf.add_page()
-                    pdf.set_fill_color(13, 13, 13)
-                    pdf.rect(0, 0, 210, 297, 'F')
-                    pdf.set_text_color(255, 255, 255)
-                    pdf.set_font("Arial", 'B', 14)
-                    pdf.cell(0, 10, clean_text(title), ln=True, align='C')
-                    pdf.image(path, x=25, w=160)
-                    os.remove(path)
-            except Exception as e:
-                pdf.cell(0, 10, clean_text(f"Chart error: {e}"), ln=True)
-
-    # Página final con definiciones
-    pdf.add_page()
-    pdf.set_fill_color(13, 13, 13)
-    pdf.rect(0, 0, 210, 297, 'F')
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, clean_text("Metric Definitions"), ln=True, align='C')
-    pdf.set_font("Arial", size=10)
-
-    for label, definition in metric_definitions.items():
-        pdf.multi_cell(0, 6, clean_text(f"{label}: {definition}"))
-
-    return pdf.output(dest='S').encode('latin-1')
 
+# Informe en segundo plano: gráficos de `df_sums` y luego `construir(imágenes)` -> bytes.
+# Corre fuera del script (ver jobs.py): no puede llamar a Streamlit. Las etapas
+# ("gráficos pdf" y `etapa`) se pasan a los tiempos del rerun al terminar (ver report_timings).
+def report_job(construir, df_sums, grouped_metrics, metrics, etapa):
+    # FPDF importa PIL, que Plotly también importa al enviar los gráficos: se carga en el hilo
+    # del script para que el trabajo (que ya no espera a Kaleido) no lo importe a la vez
+    import report  # noqa: F401
+
+    def trabajo(job):
+        # Un paso más que gráficos: la maquetación del PDF
+        with job.stage("gráficos pdf"):
+            bar_chart_images, errores = report_charts(
+                df_sums, grouped_metrics, metrics, progress=lambda h, t: job.progress(h, t + 1)
+            )
+        with job.stage(etapa):
+            resultado = construir(bar_chart_images)
+        job.progress(job.total, job.total)
+        # Los gráficos que fallen se avisan sin interrumpir el informe
+        return resultado, [f"No se pudo guardar la imagen para {k}: {e}" for k, e in errores]
+    return trabajo
+
+
+# Texto de un valor de filtro: TODOS se muestra traducido
+def filter_label(valor):
+    return labels["all"] if valor == TODOS else str(valor)
+
+
+def submit_report(id, trabajo, nombre, archivo, mime):
+    job = get_queue().submit(id, trabajo, nombre, archivo, mime)
+    trabajos = st.session_state.setdefault("informes", [])
+    if job.id not in trabajos:
+        trabajos.append(job.id)
+
+
+def report_panel():
+    """Informes de la sesión: progreso mientras se generan y descarga al terminar."""
+    cola = get_queue()
+    estados = {jobs.PENDIENTE: labels["job_pendiente"], jobs.EN_CURSO: labels["job_en_curso"]}
+    trabajos = [j for j in (cola.get(i) for i in st.session_state.get("informes", [])) if j is not None]
+    for job in reversed(trabajos):
+        if job.estado == jobs.LISTO:
+            st.download_button(
+                f"{labels['download_report']}: {job.nombre}", job.resultado, file_name=job.archivo, mime=job.mime,
+                key=f"descarga_{job.id}", on_click="ignore"
+            )
+            for aviso in job.avisos:
+                st.warning(aviso)
+            if debug:
+                st.caption(" | ".join(
+                    [f"total: {job.segundos:.2f}s"] + [f"{k}: {s:.2f}s" for k, s in job.etapas.items()]
+                ))
+        elif job.estado == jobs.ERROR:
+            st.error(f"{job.nombre}: {job.error}")
+        else:
+            st.progress(job.fraccion, text=f"{job.nombre} ({estados[job.estado]}) {job.hechos}/{job.total}")
+    return any(not j.terminado for j in trabajos)
+
+
+def report_timings():
+    """Pasa a los tiempos de este rerun las etapas de los informes que acaban de terminar."""
+    medidos = st.session_state.setdefault("informes_medidos", set())
+    for job in map(get_queue().get, st.session_state.get("informes", [])):
+        if job is not None and job.terminado and job.id not in medidos:
+            for nombre, segundos in job.etapas.items():
+                timings.add(nombre, segundos)
+            medidos.add(job.id)
 
 
 # Filtros y carga de archivos
 st.sidebar.header("Filtros")
 uploaded_files = st.sidebar.file_uploader(labels["upload"], type=["csv"], accept_multiple_files=True)
+raw_files = st.sidebar.file_uploader(labels["upload_raw"], type=["csv"], accept_multiple_files=True)
+
+# Almacén local (opcional, GPS_STORE_DIR): los partidos ya subidos siguen disponibles entre sesiones
+store = open_store()
+quitados = st.session_state.setdefault("quitados", set())
+if store is not None and uploaded_files:
+    with timings.stage("ingesta"):
+        store.ingest(uploaded_files, excluir=quitados)
+if store is not None and len(store):
+    # Los partidos quitados no se vuelven a guardar en esta sesión aunque su archivo siga subido
+    with st.sidebar.expander(labels["stored_matches"]):
+        seleccion = st.multiselect(labels["remove_matches"], store.matches(), key="quitar")
+        if st.button(labels["remove"], disabled=not seleccion):
+            for p in seleccion:
+                quitados |= store.remove(p)
+# Las trazas crudas se guardan en binario y se leen con memory-map (ver traces.py)
+trace_store = open_trace_store()
+if trace_store is not None and raw_files:
+    with timings.stage("ingesta trazas"):
+        trace_store.ingest(raw_files)
+hay_trazas = bool(raw_files) or (trace_store is not None and len(trace_store) > 0)
+
+if "match_frame" not in st.session_state:
+    st.session_state["match_frame"] = MatchFrame()
+match_frame = st.session_state["match_frame"]
+
+full_df = None
+if store is None and uploaded_files:
+    # Solo se procesan los archivos nuevos o modificados (caché por hash de contenido)
+    with timings.stage("ingesta"):
+        full_df = ingest_files(uploaded_files, match_frame)
+    partidos_disponibles = match_frame.cube.matches()
+elif store is not None:
+    partidos_disponibles = store.matches()
+
+if full_df is not None or (store is not None and len(store)):
+    partidos = match_options(partidos_disponibles)
+    # Los filtros guardan ids (TODOS, número de tiempo, id de métrica) y solo se traducen al mostrarse:
+    # al cambiar de idioma se conservan y los agregados, figuras y PNG ya calculados siguen sirviendo
+    partido = st.sidebar.selectbox(labels["match"], [TODOS] + partidos, format_func=filter_label, key="partido")
+
+    if store is not None:
+        # Solo se leen las particiones del partido elegido
+        with timings.stage("almacén"):
+            full_df = store.load(match_frame, None if partido == TODOS else partido)
+    timings.count("archivos", len(match_frame.claves))
+    timings.count("filas", 0 if full_df is None else len(full_df))
+
+    tiempos = {TODOS: labels["all"], 1: labels["first_half"], 2: labels["second_half"]}
+    tiempo = st.sidebar.selectbox(labels["half"], list(tiempos), format_func=tiempos.get, key="tiempo")
+
+    cube = match_frame.cube
+    jugador = st.sidebar.selectbox(labels["player"], [TODOS] + cube.players(), format_func=filter_label, key="jugador")
+    grupo = st.sidebar.selectbox(
+        labels["metric_group"], [TODOS] + list(METRIC_GROUPS),
+        format_func=lambda g: labels["all"] if g == TODOS else labels[g], key="grupo"
+    )
 
-if uploaded_files:
-    all_dfs = []
-    for file in uploaded_files:
-        df = pd.read_csv(file, delimiter=';')
-        df.columns = df.columns.str.strip()
-        name_parts = file.name.split('_')
-        try:
-            year, month, day = name_parts[-3], name_parts[-2], name_parts[-1].split('.')[0]
-            fecha = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-        except:
-            fecha = 'Sin Fecha'
-        df['Fecha CSV'] = fecha
-        df['Archivo'] = file.name
-        partido_base = re.sub(r'\s*[-_]*\s*(1ER|2DO)?\s*TIEMPO', '', df['Period Name'].iloc[0], flags=re.IGNORECASE)
-        df['Partido + Fecha'] = f"{partido_base.strip()} | {fecha}"
-        all_dfs.append(df)
-
-    full_df = pd.concat(all_dfs, ignore_index=True)
-
-    metrics = {
-        labels["distance"]: 'Work Rate Total Dist',
-        labels["tempo"]: 'Tempo Distance (Gen2)',
-        labels["hsr"]: 'HSR Eff Distance (Gen2)',
-        labels["sprint"]: 'Sprint Eff Distance (Gen2)',
-        labels["sprint_count"]: 'Sprint Eff Count (Gen2)',
-        labels["max_speed"]: 'Max Velocity',
-        labels["acc"]: 'Acc Eff Count (Gen2)',
-        labels["dec"]: 'Dec Eff Count (Gen2)',
-        labels["load"]: 'Player Load',
-        "Peak Player Load": 'Peak Player Load',
-        "Player Load Work Time": 'Player Load Work Time',
-        "Player Load Rest Time": 'Player Load Rest Time',
-        "Player Load Work:Rest": 'Player Load Work:Rest',
-        "Velocity Exertion": 'Velocity Exertion',
-        "Velocity Exertion Per Min": 'Velocity Exertion Per Min',
-        "Acceleration Load": 'Acceleration Load',
-        "Acceleration Density Index": 'Acceleration Density Index',
-        labels["rhie"]: 'RHIE Total Bouts'
-    }
-
-    partidos = sorted(set([p for p in full_df['Partido + Fecha'].unique() if not re.search(r'(1ER|2DO)', p, re.IGNORECASE)]))
-    partido = st.sidebar.selectbox(labels["match"], [labels["all"]] + partidos)
-
-    tiempo_map = {labels["all"]: 'Todos', labels["first_half"]: 1, labels["second_half"]: 2}
-    tiempo_sel = st.sidebar.selectbox(labels["half"], list(tiempo_map.keys()))
-
-    jugadores = [labels["all"]] + sorted(full_df['Player Name'].dropna().unique().tolist())
-    jugador = st.sidebar.selectbox(labels["player"], jugadores)
-
-    df = full_df.copy()
-    if partido != labels["all"]:
-        df = df[df['Partido + Fecha'] == partido]
-    if tiempo_map[tiempo_sel] != 'Todos':
-        df = df[df['Period Number'] == tiempo_map[tiempo_sel]]
-    if jugador != labels["all"]:
-        df = df[df['Player Name'] == jugador]
-
-    st.title(f"{labels['title']} - {jugador if jugador != labels['all'] else ''} {('| ' + partido) if partido != labels['all'] else ''}")
-
-    if not df.empty:
-        columns_exist = [v for v in metrics.values() if v in df.columns]
-        df[columns_exist] = df[columns_exist].apply(pd.to_numeric, errors='coerce')
-        df_grouped = df.groupby('Player Name')[columns_exist].mean().reset_index()
-
-        st.subheader(f"{labels['averages']}: {jugador}" if jugador != labels["all"] else labels['averages'])
-
-        grouped_metrics = {
-            labels["Carga"]: [labels["load"], "Peak Player Load", "Player Load Work Time", "Player Load Rest Time", "Player Load Work:Rest"],
-            labels["Velocidad e Intensidad"]: [labels["max_speed"], "Velocity Exertion", "Velocity Exertion Per Min"],
-            labels["Aceleración y Desaceleración"]: [labels["acc"], labels["dec"], "Acceleration Load", "Acceleration Density Index"],
-            labels["Distancias"]: [labels["distance"], labels["tempo"], labels["hsr"], labels["sprint"], labels["sprint_count"]],
-            labels["Esfuerzos Repetidos"]: [labels["rhie"]]
-        }
-
-        if st.button(labels["create_pdf"]):
-            resumen = {"Partido": partido, "Fecha": df['Fecha CSV'].iloc[0], "Jugador": jugador}
-            resumen_avg = {}
-            for group, keys in grouped_metrics.items():
-                items = []
-                for k in keys:
-                    col_key = metrics.get(k)
-                    if col_key in df_grouped.columns:
-                        val = df_grouped[col_key].mean()
-                        if not pd.isna(val) and val != 0:
-                            items.append((k, val))
-                if items:
-                    resumen_avg[group] = items
-
-            bar_chart_images = []
-            for group, keys in grouped_metrics.items():
-                for k in keys:
-                    if k in metrics and metrics[k] in df.columns:
-                        chart_df = df.groupby('Player Name')[metrics[k]].sum().reset_index().sort_values(metrics[k], ascending=True)
-                        fig = neon_bar_chart(chart_df, k, metrics[k])
-                        safe_group = re.sub(r'[^\w\-]', '_', group)
-                        safe_k = re.sub(r'[^\w\-]', '_', k)
-                        image_path = f"bar_chart_{safe_group}_{safe_k}.png"
-                        try:
-                            fig.write_image(image_path)
-                            bar_chart_images.append({"path": image_path, "title": f"{group} - {k}"})
-                        except Exception as e:
-                            st.warning(f"No se pudo guardar la imagen para {k}: {e}")
-
-            pdf_bytes = generate_pdf(labels["pdf_title"], resumen, resumen_avg, bar_charts=bar_chart_images)
-            b64 = base64.b64encode(pdf_bytes).decode()
-            href = f'<a href="data:application/octet-stream;base64,{b64}" download="{labels["pdf_file"]}">{labels["download_pdf"]}</a>'
-            st.markdown(href, unsafe_allow_html=True)
-
-        for group, keys in grouped_metrics.items():
-            st.markdown(f"### {labels['avg_of']} {group}")
-            metric_items = [(k, metrics[k]) for k in keys if k in metrics and metrics[k] in df_grouped.columns]
+    # Con plantillas grandes la página no crece con jugadores x métricas (ver core.LARGE_SQUAD)
+    plantilla_grande = len(cube.players()) > LARGE_SQUAD
+    vistas = {'all': labels["view_all"], 'group': labels["view_group"], 'on_demand': labels["view_on_demand"]}
+    vista = st.sidebar.radio(
+        labels["chart_view"], list(vistas), format_func=vistas.get, index=1 if plantilla_grande else 0, key="vista"
+    )
+    limite = st.sidebar.select_slider(
+        labels["players_per_chart"], [TODOS] + CHART_LIMITS, format_func=filter_label,
+        value=CHART_LIMITS[-2] if plantilla_grande else TODOS, key="limite"
+    )
+    top = None
+    if limite != TODOS:
+        extremos = {1: labels["top"], -1: labels["bottom"]}
+        signo = st.sidebar.radio(
+            labels["players_per_chart"], list(extremos), format_func=extremos.get, horizontal=True,
+            label_visibility="collapsed", key="extremo"
+        )
+        top = signo * limite
+
+    # Los filtros se resuelven con una búsqueda en el cubo precalculado (ver cube.py)
+    with timings.stage("filtros"):
+        agregados = cube.lookup(partido, tiempo, jugador)
+    # Métricas que se pueden mostrar: columnas del CSV y derivadas calculables a partir de ellas
+    columnas_csv = set(agregados.columns.get_level_values(1))
+    disponibles = [i for i, v in METRICS.items() if v in columnas_csv or available(i, columnas_csv)]
+    # Las cajas siguen al grupo elegido y los gráficos a la vista; bajo demanda, solo los abiertos
+    grupos_cajas = list(METRIC_GROUPS) if grupo == TODOS else [grupo]
+    graficos = [
+        i for i in ordered_metrics(METRICS, METRIC_GROUPS, grupo, solo_grupo=vista == 'group') if i in disponibles
+    ]
+    pedidas = [i for g in grupos_cajas for i in METRIC_GROUPS[g]] + [
+        i for i in graficos if vista != 'on_demand' or st.session_state.get(f"chart_{METRICS[i]}")
+    ]
+    # Solo se evalúan las derivadas que pide la vista, sobre los agregados ya filtrados (ver derived.py)
+    with timings.stage("derivadas"):
+        agregados = with_derived(agregados, pedidas)
+
+    st.title(f"{labels['title']} - {jugador if jugador != TODOS else ''} {('| ' + partido) if partido != TODOS else ''}")
+
+    if not agregados.empty:
+        df_sums = agregados['sum']
+        columns_exist = [v for v in METRICS.values() if v in df_sums.columns]
+        df_grouped = agregados['mean'][columns_exist].reset_index()
+
+        st.subheader(f"{labels['averages']}: {jugador}" if jugador != TODOS else labels['averages'])
+
+        # Los informes llevan los nombres traducidos: se generan con las vistas por idioma del registro
+        metrics = get_metrics(labels)
+        grouped_metrics = get_grouped_metrics(labels)
+
+        pdf_col, zip_col = st.columns(2)
+        # Los informes se generan en segundo plano (ver jobs.py); FPDF (y Kaleido con GPS_PDF_CHARTS=png)
+        # se cargan solo al generar uno (ver benchmarks/startup.py)
+        if pdf_col.button(labels["create_pdf"]):
+            # El informe lleva todas las métricas, derivadas incluidas
+            informe = with_derived(cube.lookup(partido, tiempo, jugador), list(METRICS))
+            sumas_informe = informe['sum']
+            columnas_informe = [v for v in METRICS.values() if v in sumas_informe.columns]
+            medias_informe = informe['mean'][columnas_informe].reset_index()
+            resumen = {"Partido": filter_label(partido), "Fecha": cube.date(partido), "Jugador": filter_label(jugador)}
+            resumen_avg = group_averages(medias_informe, grouped_metrics, metrics)
+            # Sección primer / segundo tiempo: del jugador o la media de la plantilla en el partido
+            filas_tiempos = half_rows(half_summary(half_table(cube, list(METRICS)), partido, jugador), metrics)
+
+            def construir_pdf(bar_chart_images):
+                from report import generate_pdf
+                return generate_pdf(
+                    labels["pdf_title"], resumen, resumen_avg, labels, metric_definitions,
+                    bar_charts=bar_chart_images, halves=filas_tiempos
+                )
+
+            submit_report(
+                job_id(
+                    'pdf', lang, partido, tiempo, jugador, data_digest(sumas_informe), data_digest(medias_informe),
+                    filas_tiempos
+                ),
+                report_job(construir_pdf, sumas_informe, grouped_metrics, metrics, "pdf"),
+                f"PDF {filter_label(partido)} {tiempos[tiempo]} {filter_label(jugador)}", labels["pdf_file"], "application/pdf"
+            )
+
+        if zip_col.button(labels["create_zip"]):
+            # Un informe por jugador con los gráficos del equipo compartidos entre todos
+            equipo = with_derived(cube.lookup(partido, tiempo), list(METRICS))
+            medias = equipo['mean'][[v for v in METRICS.values() if v in equipo['mean'].columns]]
+            fecha = cube.date(partido)
+            tiempos_equipo = half_table(cube, list(METRICS))
+
+            # El trabajo corre después del rerun: los datos se fijan al encolarlo, no al ejecutarlo
+            def construir_zip(bar_chart_images, medias=medias, fecha=fecha, tiempos_equipo=tiempos_equipo):
+                from report import generate_zip
+                informes = (
+                    (nombre,
+                     {"Partido": filter_label(partido), "Fecha": fecha, "Jugador": nombre},
+                     group_averages(medias.loc[[nombre]], grouped_metrics, metrics),
+                     half_rows(half_summary(tiempos_equipo, partido, nombre), metrics))
+                    for nombre in medias.index
+                )
+                return generate_zip(labels["pdf_title"], informes, labels, metric_definitions, bar_charts=bar_chart_images)
+
+            submit_report(
+                job_id('zip', lang, partido, tiempo, data_digest(equipo['sum']), data_digest(medias)),
+                report_job(construir_zip, equipo['sum'], grouped_metrics, metrics, "zip"),
+                f"ZIP {filter_label(partido)} {tiempos[tiempo]}", labels["zip_file"], "application/zip"
+            )
+
+        # Solo este panel se refresca mientras haya informes en curso; los filtros siguen disponibles
+        if st.session_state.get("informes"):
+            # El fragmento no cierra el rerun: los tiempos se recogen en el rerun completo
+            report_timings()
+            activos = any(
+                j is not None and not j.terminado for j in map(get_queue().get, st.session_state["informes"])
+            )
+
+            @st.fragment(run_every=1 if activos else None)
+            def informes():
+                if not report_panel() and activos:
+                    st.rerun()
+
+            informes()
+
+        for grupo_id in grupos_cajas:
+            ids = METRIC_GROUPS[grupo_id]
+            st.markdown(f"### {labels['avg_of']} {labels[grupo_id]}")
+            metric_items = [(i, METRICS[i]) for i in ids if METRICS[i] in df_grouped.columns]
             for i in range(0, len(metric_items), 4):
                 metric_cols = st.columns(4)
                 for j, (k, v) in enumerate(metric_items[i:i+4]):
                     avg = df_grouped[v].mean()
                     if not pd.isna(avg) and avg != 0:
-                        definition = metric_definitions.get(k, "")
+                        definition = METRIC_DEFINITIONS.get(k, "")
                         metric_cols[j].markdown(f"""
                             <div class='metric-box'>
-                                <div class='metric-title'>{k}</div>
+                                <div class='metric-title'>{metric_label(k, labels)}</div>
                                 <div class='metric-value'>{avg:.1f}</div>
                                 <div style='font-size:10px; color:#bbb;'>{definition}</div>
                             </div>
@@ -356,14 +349,142 @@ if uploaded_files:
 
         st.divider()
 
-        for k, v in metrics.items():
-            if v in df.columns:
-                st.subheader(k)
-                if k in metric_definitions:
-                    with st.expander("¿Qué significa esta métrica?"):
-                        st.markdown(metric_definitions[k])
-                chart_df = df.groupby('Player Name')[v].sum().reset_index().sort_values(v, ascending=True)
-                fig = neon_bar_chart(chart_df, k, v)
+        # Las figuras se reutilizan entre reruns mientras no cambien los datos filtrados
+        for i in graficos:
+            k, v = metric_label(i, labels), METRICS[i]
+            st.subheader(k)
+            if i in METRIC_DEFINITIONS:
+                with st.expander("¿Qué significa esta métrica?"):
+                    st.markdown(METRIC_DEFINITIONS[i])
+            # Bajo demanda, solo se envían al navegador los gráficos que se abren
+            if vista == 'on_demand' and not st.toggle(labels["show_chart"], key=f"chart_{v}"):
+                continue
+            with timings.stage("figuras"):
+                fig = cached_bar_chart(df_sums, k, v, labels, metric_definitions, lang, top)
+            with timings.stage("envío de gráficos"):
                 st.plotly_chart(fig, use_container_width=True)
-else:
+            timings.count("gráficos")
+
+        def season_cube():
+            # Con almacén, `cube` solo tiene el partido elegido: la temporada va en un cubo propio
+            if store is None:
+                return cube
+            temporada = st.session_state.setdefault("temporada", AggregateCube())
+            temporada.update(store.frames(temporada))
+            return temporada
+
+        # Comparación con la plantilla y con el historial propio (ver compare.py)
+        st.divider()
+        st.header(labels["compare"])
+        metrica_cmp = st.selectbox(
+            labels["compare_metric"], disponibles,
+            format_func=lambda i: metric_label(i, labels), key="metrica_comparacion"
+        )
+        campos = {c: labels[c] for c in COMPARE_FIELDS}
+        with timings.stage("comparación"):
+            if partido == TODOS and jugador == TODOS:
+                medias_cmp = with_derived(cube.lookup(partido, tiempo), [metrica_cmp])['mean']
+                comparacion = squad_ranks(medias_cmp[[METRICS[metrica_cmp]]])
+            else:
+                comparacion = comparison_table(season_cube(), tiempo, [metrica_cmp])
+                if jugador != TODOS:
+                    comparacion = comparacion.xs(jugador, level='Player Name')
+                else:
+                    comparacion = comparacion.xs(partido, level='Partido + Fecha')
+            comparacion = comparacion[METRICS[metrica_cmp]].rename(columns=campos)
+        if jugador == TODOS:
+            comparacion = comparacion.sort_values(campos['percentil'], ascending=False)
+        st.dataframe(comparacion.round(2), use_container_width=True)
+        if jugador != TODOS and len(comparacion) > 1:
+            st.line_chart(comparacion[[campos['z_equipo'], campos['z_personal']]])
+
+        # Primer tiempo frente a segundo tiempo de todos los partidos en un solo pivote (ver fatigue.py)
+        with timings.stage("tiempos"):
+            perfiles = half_table(season_cube(), [])
+        if not perfiles.empty:
+            st.divider()
+            st.header(labels["halves"])
+            campos = {c: labels[c] for c in HALF_FIELDS}
+            if jugador == TODOS:
+                metrica_mitades = st.selectbox(
+                    labels["halves_metric"], disponibles,
+                    format_func=lambda i: metric_label(i, labels), key="metrica_tiempos"
+                )
+                with timings.stage("tiempos"):
+                    perfiles = half_table(season_cube(), [metrica_mitades])
+                # Un partido sin primer y segundo tiempo (p. ej. un export de un solo periodo) no está en la tabla
+                if partido in perfiles.index.get_level_values(0):
+                    mitades = perfiles.xs(partido, level=0)[METRICS[metrica_mitades]].sort_values('cambio_pct')
+                    st.dataframe(mitades.rename(columns=campos).round(2), use_container_width=True)
+                else:
+                    st.info(labels["halves_no_data"])
+            else:
+                # Todas las métricas del jugador y cómo cambia cada una partido a partido
+                with timings.stage("tiempos"):
+                    perfiles = half_table(season_cube(), list(METRICS))
+                mitades = half_summary(perfiles, partido, jugador).dropna(how='all')
+                nombres = {v: metric_label(i, labels) for i, v in METRICS.items() if v in mitades.index}
+                mitades = mitades.loc[list(nombres)].rename(index=nombres, columns=campos)
+                if mitades.empty:
+                    st.info(labels["halves_no_data"])
+                else:
+                    st.dataframe(mitades.round(2), use_container_width=True)
+                if jugador in perfiles.index.get_level_values(1):
+                    historial = perfiles.xs(jugador, level=1).xs('cambio_pct', axis=1, level=1).drop(TODOS, errors='ignore')
+                else:
+                    historial = perfiles.iloc[:0]
+                if len(historial) > 1:
+                    st.subheader(labels["halves_history"])
+                    metrica_mitades = st.selectbox(
+                        labels["halves_metric"], [i for i, v in METRICS.items() if v in historial.columns],
+                        format_func=lambda i: metric_label(i, labels), key="metrica_tiempos"
+                    )
+                    st.line_chart(historial[METRICS[metrica_mitades]])
+
+    # Carga aguda:crónica de toda la temporada, no solo del partido elegido (ver workload.py)
+    if "workload" not in st.session_state:
+        st.session_state["workload"] = WorkloadEngine()
+    workload = st.session_state["workload"]
+    fuente = store if store is not None else match_frame
+    with timings.stage("acwr"):
+        workload.update(fuente.frames(workload, columns=WORKLOAD_COLUMNS))
+
+    if len(workload):
+        st.divider()
+        st.header(labels["workload"])
+        col_metrica, col_metodo = st.columns(2)
+        metrica = col_metrica.selectbox(
+            labels["workload_metric"], ["load", "hsr", "sprint"], format_func=lambda i: metric_label(i, labels),
+            key="metrica_carga"
+        )
+        metodo = col_metodo.radio(labels["workload_method"], METHODS, format_func=lambda m: labels[m], horizontal=True, key="metodo")
+        with timings.stage("acwr"):
+            ratios = workload.ratios(METRICS[metrica], metodo, jugador)
+        st.line_chart(ratios)
+        st.caption(labels["latest"])
+        st.dataframe(ratios.ffill().tail(1).T.round(2), use_container_width=True)
+elif not hay_trazas:
     st.info("Cargue uno o más archivos CSV para comenzar / Upload one or more CSV files to begin.")
+
+# Demandas máximas por ventana móvil, a partir de las trazas crudas (ver peaks.py)
+if hay_trazas:
+    with timings.stage("picos"):
+        picos = trace_store.peak_table() if trace_store is not None else peak_table(raw_files)
+    st.divider()
+    st.header(labels["peaks"])
+    ventana = st.selectbox(labels["window"], PEAK_WINDOWS)
+    tabla = picos.xs(ventana, level='Ventana').rename(columns={m: labels[m] for m in PEAK_METRICS})
+    st.dataframe(tabla.round(1), use_container_width=True)
+
+# Registro del rerun y panel de depuración
+resultado = timings.finish()
+historial = st.session_state.setdefault("timings", [])
+historial.append(resultado)
+del historial[:-MAX_HISTORIAL]
+if debug:
+    with st.sidebar.expander("Debug", expanded=True):
+        st.metric("Rerun (s)", f"{resultado['total']:.3f}")
+        st.dataframe(pd.Series(resultado["etapas"], name="s").round(4), use_container_width=True)
+        st.json({"contadores": resultado["contadores"], "caches": resultado["caches"]}, expanded=False)
+        st.line_chart(history_frame(historial))
+        st.download_button("JSON", json.dumps(historial, indent=1), file_name="gps_timings.json", mime="application/json")
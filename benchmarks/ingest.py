@@ -0,0 +1,73 @@
+"""Escalado de la ingesta en frío con el número de procesos de parseo.
+
+    python benchmarks/ingest.py [--players 25] [--matches 200] [--workers 1 2 4 8] [--engine auto]
+
+Parsea una temporada sintética sin caché (`IngestCache.load_many`) y la une en
+un solo DataFrame (`concat_frames`, como `full_df`), primero en el proceso
+actual y luego con pools de N procesos ya arrancados (el arranque del pool no
+se mide). Muestra tiempo, aceleración y eficiencia por núcleo; con `--min-efficiency` falla (código 1) si algún N no
+llega a esa fracción de la aceleración lineal. `--engine` fija GPS_CSV_ENGINE
+también en los procesos del pool.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import season  # noqa: E402
+
+
+def run(archivos, pool=None):
+    """Segundos de parseo + unión de `archivos` (lista de (nombre, bytes, clave))."""
+    from ingest import IngestCache
+    from schema import concat_frames
+    inicio = time.perf_counter()
+    frames = IngestCache().load_many(archivos, pool)
+    concat_frames(list(frames.values()))
+    return time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--matches", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--engine", choices=["auto", "c", "pyarrow"], default="auto")
+    parser.add_argument("--min-efficiency", type=float, default=0.0, help="p. ej. 0.6 = 60 %% de la aceleración lineal")
+    args = parser.parse_args(argv)
+
+    os.environ["GPS_CSV_ENGINE"] = args.engine
+    from ingest import file_digest
+
+    archivos = [(nombre, datos, file_digest(datos)) for nombre, datos in season(args.players, args.matches, args.seed)]
+    print(f"{len(archivos)} archivos, {sum(len(a[1]) for a in archivos) / 2 ** 20:.1f} MB, "
+          f"{os.cpu_count()} núcleos, motor {args.engine}")
+
+    run(archivos[:1])
+    base = run(archivos)
+    print(f"{'1 (en proceso)':<16} {base:8.3f}s")
+    errores = []
+    for n in args.workers:
+        if n < 2:
+            continue
+        with ProcessPoolExecutor(n, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Cada proceso importa pandas y el módulo una vez: se calienta antes de medir
+            run(archivos[:n], pool)
+            segundos = run(archivos, pool)
+        aceleracion = base / segundos
+        eficiencia = aceleracion / min(n, os.cpu_count() or 1)
+        print(f"{n:<16} {segundos:8.3f}s  x{aceleracion:5.2f}  eficiencia {eficiencia:4.0%}")
+        if eficiencia < args.min_efficiency:
+            errores.append(f"{n} procesos: eficiencia {eficiencia:.0%} < {args.min_efficiency:.0%}")
+    for e in errores:
+        print(f"FALLO: {e}", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""Benchmark del pipeline completo sobre una temporada sintética.
+
+    python benchmarks/pipeline.py [--players 25] [--matches 38] [--no-charts] [--pdf-charts vector] [--json salida.json]
+
+Mide, con datos de `synthetic.py`, el tiempo y el pico de memoria de cada
+etapa: ingesta en frío y en un rerun, cubo y filtros, construcción de figuras,
+ACWR y `generate_pdf` de extremo a extremo (gráficos incluidos salvo con
+`--no-charts`; `--pdf-charts png` los rasteriza con Kaleido en lugar de
+dibujarlos con FPDF). Los tiempos salen de una pasada sin trazar y los picos
+de memoria de una segunda pasada con tracemalloc, que ralentiza pandas. Esa
+segunda pasada corre en un intérprete nuevo, con las cachés vacías, sin caché
+en disco y parseando en el mismo proceso (tracemalloc no ve los workers).
+Falla (código 1) si una etapa supera su presupuesto; los presupuestos son para
+la escala por defecto y se ajustan con `--budget-scale`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import MemoryFile, season  # noqa: E402
+
+# Presupuestos por etapa para 25 jugadores x 38 partidos: (segundos, MB de pico)
+BUDGETS = {
+    "ingesta": (2.0, 100),
+    "ingesta (rerun)": (0.1, 10),
+    "cubo y filtros": (1.0, 100),
+    "figuras": (0.5, 50),
+    "acwr": (0.5, 50),
+    "pdf": (15.0, 100),
+}
+
+
+class Stages:
+    """Registro de tiempos (o de picos de memoria, con `memory=True`) por etapa."""
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.resultados = []
+
+    @contextmanager
+    def stage(self, nombre, **extra):
+        if self.memory:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            extra["etapa"] = nombre
+            if self.memory:
+                extra["pico_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+            else:
+                extra["segundos"] = time.perf_counter() - inicio
+            self.resultados.append(extra)
+
+
+def run(players, matches, charts=True, seed=0, memory=False):
+    """Ejecuta todas las etapas y devuelve una lista de dicts por etapa."""
+    from charts import ChartRenderer
+    from core import (
+        LABELS, LANGUAGES, PDF_CHARTS, chart_data, get_grouped_metrics, get_metric_definitions, get_metrics,
+        group_averages, match_options, neon_bar_chart, report_charts
+    )
+    from cube import TODOS
+    from ingest import IngestCache, MatchFrame, ingest_files
+    from report import generate_pdf
+    from schema import METRIC_COLUMNS
+    from workload import WORKLOAD_COLUMNS, WorkloadEngine
+
+    lang = LANGUAGES[0]
+    labels = LABELS[lang]
+    definitions = get_metric_definitions(labels)
+    metrics = get_metrics(labels)
+    grouped_metrics = get_grouped_metrics(labels)
+
+    files = [MemoryFile(nombre, datos) for nombre, datos in season(players, matches, seed)]
+    etapas = Stages(memory)
+
+    cache, match_frame = IngestCache(), MatchFrame()
+    with etapas.stage("ingesta", archivos=len(files)) as info:
+        df = ingest_files(files, match_frame, cache)
+        info["filas"] = len(df)
+    with etapas.stage("ingesta (rerun)"):
+        ingest_files(files, match_frame, cache)
+
+    cube = match_frame.cube
+    with etapas.stage("cubo y filtros") as info:
+        partidos = [TODOS] + match_options(cube.matches())
+        consultas = [cube.lookup(p, t) for p in partidos for t in (TODOS, 1, 2)]
+        info["consultas"] = len(consultas)
+    equipo = cube.lookup(TODOS, TODOS)
+
+    # La primera figura importa Plotly y sus validadores: es un coste de arranque, no de la etapa
+    neon_bar_chart(chart_data(equipo['sum'], METRIC_COLUMNS[0])[0], "", METRIC_COLUMNS[0], labels, definitions)
+    with etapas.stage("figuras") as info:
+        columnas = [v for v in metrics.values() if v in equipo['sum'].columns]
+        for k, v in metrics.items():
+            if v in columnas:
+                neon_bar_chart(chart_data(equipo['sum'], v)[0], k, v, labels, definitions)
+        info["figuras"] = len(columnas)
+
+    with etapas.stage("acwr") as info:
+        workload = WorkloadEngine()
+        workload.update(match_frame.frames(columns=WORKLOAD_COLUMNS))
+        info["filas"] = len(workload.table())
+
+    with etapas.stage("pdf", graficos=charts and PDF_CHARTS) as info:
+        imagenes = []
+        if charts:
+            imagenes, errores = report_charts(equipo['sum'], grouped_metrics, metrics, ChartRenderer())
+            info["errores_graficos"] = len(errores)
+        medias = equipo['mean'][[c for c in metrics.values() if c in equipo['mean'].columns]].reset_index()
+        resumen = {"Partido": labels["all"], "Fecha": cube.date(), "Jugador": labels["all"]}
+        pdf = generate_pdf(
+            labels["pdf_title"], resumen, group_averages(medias, grouped_metrics, metrics), labels, definitions,
+            bar_charts=imagenes
+        )
+        info["bytes"] = len(pdf)
+    return etapas.resultados
+
+
+def memory_pass(args):
+    """Picos de memoria por etapa medidos en un intérprete nuevo (ver el docstring del módulo)."""
+    comando = [
+        sys.executable, os.path.abspath(__file__), "--memory-pass", "--players", str(args.players),
+        "--matches", str(args.matches), "--seed", str(args.seed), "--pdf-charts", args.pdf_charts,
+    ] + (["--no-charts"] if args.no_charts else [])
+    entorno = {k: v for k, v in os.environ.items() if k != "GPS_CACHE_DIR"}
+    entorno["GPS_PARSE_WORKERS"] = "1"
+    salida = subprocess.run(comando, env=entorno, capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--matches", type=int, default=38)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-charts", action="store_true", help="PDF sin gráficos")
+    parser.add_argument("--pdf-charts", choices=["vector", "png"], default="vector", help="fija GPS_PDF_CHARTS")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="multiplica todos los presupuestos")
+    parser.add_argument("--json", help="escribe los resultados en este archivo")
+    parser.add_argument("--memory-pass", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    os.environ["GPS_PDF_CHARTS"] = args.pdf_charts
+    if args.memory_pass:
+        print(json.dumps(run(args.players, args.matches, not args.no_charts, args.seed, memory=True)))
+        return 0
+    resultados = run(args.players, args.matches, not args.no_charts, args.seed)
+    picos = memory_pass(args)
+    for r, m in zip(resultados, picos):
+        r["pico_mb"] = m["pico_mb"]
+
+    errores = []
+    print(f"{args.players} jugadores x {args.matches} partidos")
+    for r in resultados:
+        segundos, megas = (b * args.budget_scale for b in BUDGETS[r["etapa"]])
+        print(f"{r['etapa']:<18} {r['segundos']:8.3f}s (presupuesto {segundos:.1f}s) "
+              f"{r['pico_mb']:8.1f} MB (presupuesto {megas:.0f} MB)")
+        if r["segundos"] > segundos:
+            errores.append(f"{r['etapa']}: {r['segundos']:.2f}s > {segundos:.1f}s")
+        if r["pico_mb"] > megas:
+            errores.append(f"{r['etapa']}: {r['pico_mb']:.0f} MB > {megas:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"players": args.players, "matches": args.matches, "etapas": resultados}, f, indent=1)
+    for e in errores:
+        print(f"FALLO: {e}", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Tiempo de arranque de la app: importaciones y primer render de la pantalla de carga.
+
+    python benchmarks/startup.py [--repeat 5] [--import-budget 2.0] [--render-budget 3.0]
+
+Cada medición corre en un intérprete nuevo (arranque en frío). Falla (código 1)
+si se supera algún presupuesto o si la pantalla inicial carga el stack de
+informes (Kaleido, FPDF), que solo debe importarse al generar un PDF. Plotly no
+se comprueba: Streamlit ya lo importa al cargar `st.plotly_chart`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuestos por defecto, en segundos
+IMPORT_BUDGET = 2.0
+RENDER_BUDGET = 3.0
+
+REPORT_MODULES = ("kaleido", "fpdf")
+
+_IMPORTS = """
+import json, time
+t = time.perf_counter()
+import {modules}
+print(json.dumps(time.perf_counter() - t))
+"""
+
+_FIRST_RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+t = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - t
+print(json.dumps({{
+    "seconds": elapsed,
+    "exception": [str(e.message) for e in at.exception],
+    "report_modules": sorted({{m.split('.')[0] for m in sys.modules}} & set({report!r})),
+}}))
+"""
+
+
+def _run(code, env=None):
+    salida = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def time_imports(modules, repeat):
+    return statistics.median(_run(_IMPORTS.format(modules=", ".join(modules))) for _ in range(repeat))
+
+
+def first_render(repeat):
+    resultados = []
+    with tempfile.TemporaryDirectory() as store_dir:
+        # Almacén vacío: se mide la pantalla de carga, no la de un partido guardado
+        env = dict(os.environ, GPS_STORE_DIR=store_dir)
+        for _ in range(repeat):
+            resultados.append(_run(_FIRST_RENDER.format(app=os.path.join(ROOT, "app.py"), report=REPORT_MODULES), env))
+    resultados.sort(key=lambda r: r["seconds"])
+    return resultados[len(resultados) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET)
+    parser.add_argument("--render-budget", type=float, default=RENDER_BUDGET)
+    args = parser.parse_args(argv)
+
+    app_imports = time_imports(["streamlit", "core", "cube", "ingest", "store"], args.repeat)
+    report_imports = time_imports(["report", "plotly.io._kaleido"], args.repeat)
+    render = first_render(args.repeat)
+
+    print(f"importaciones de la app:      {app_imports:.3f}s (presupuesto {args.import_budget:.1f}s)")
+    print(f"stack de informes (diferido): {report_imports:.3f}s")
+    print(f"primer render (sin datos):    {render['seconds']:.3f}s (presupuesto {args.render_budget:.1f}s)")
+
+    errores = []
+    if render["exception"]:
+        errores.append(f"la app lanzó una excepción: {render['exception']}")
+    if render["report_modules"]:
+        errores.append(f"la pantalla inicial importa {', '.join(render['report_modules'])}")
+    if app_imports > args.import_budget:
+        errores.append("importaciones por encima del presupuesto")
+    if render["seconds"] > args.render_budget:
+        errores.append("primer render por encima del presupuesto")
+    for e in errores:
+        print(f"FALLO: {e}", file=sys.stderr)
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
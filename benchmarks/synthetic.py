@@ -0,0 +1,120 @@
+"""Exportaciones sintéticas de partidos, con el mismo formato que los CSV reales.
+
+    python benchmarks/synthetic.py carpeta --players 25 --matches 38 [--seed 0]
+
+Cada partido es un CSV delimitado por ';' llamado `<RIVAL>_AAAA_MM_DD.csv`, con
+una fila por jugador y tiempo (`Period Name` "<RIVAL> - 1ER TIEMPO" / "2DO
+TIEMPO") y todas las columnas de `schema.METRIC_COLUMNS`. Los valores siguen
+rangos realistas por tiempo y un perfil fijo por jugador, para que los
+promedios y el ACWR tengan forma de temporada real.
+"""
+import argparse
+import datetime
+import io
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import METRIC_COLUMNS  # noqa: E402
+
+# (media, desviación) por jugador y tiempo de 45 minutos
+METRIC_PROFILES = {
+    'Work Rate Total Dist': (5200, 600),
+    'Tempo Distance (Gen2)': (1500, 250),
+    'HSR Eff Distance (Gen2)': (350, 120),
+    'Sprint Eff Distance (Gen2)': (120, 60),
+    'Sprint Eff Count (Gen2)': (6, 3),
+    'Max Velocity': (8.2, 0.6),
+    'Acc Eff Count (Gen2)': (25, 8),
+    'Dec Eff Count (Gen2)': (28, 8),
+    'Player Load': (520, 70),
+    'Peak Player Load': (9, 1.5),
+    'Player Load Work Time': (38, 5),
+    'Player Load Rest Time': (7, 3),
+    'Player Load Work:Rest': (5, 1.5),
+    'Velocity Exertion': (260, 40),
+    'Velocity Exertion Per Min': (5.8, 0.8),
+    'Acceleration Load': (900, 150),
+    'Acceleration Density Index': (2.1, 0.3),
+    'RHIE Total Bouts': (3, 2),
+}
+
+# Métricas que son conteos enteros en el export
+COUNT_METRICS = {'Sprint Eff Count (Gen2)', 'Acc Eff Count (Gen2)', 'Dec Eff Count (Gen2)', 'RHIE Total Bouts'}
+
+PERIODS = [(1, '1ER TIEMPO'), (2, '2DO TIEMPO')]
+
+
+def match_csv(rival, jugadores, rng, perfiles=None):
+    """Bytes de un CSV de partido para `jugadores` (lista de nombres)."""
+    n = len(jugadores)
+    if perfiles is None:
+        perfiles = np.ones(n)
+    lineas = ['Player Name;Period Name;Period Number;' + ';'.join(METRIC_COLUMNS)]
+    for numero, nombre_periodo in PERIODS:
+        # Caída de rendimiento en el segundo tiempo
+        fatiga = 1.0 if numero == 1 else 0.93
+        columnas = []
+        for metrica in METRIC_COLUMNS:
+            media, desviacion = METRIC_PROFILES[metrica]
+            valores = np.clip(rng.normal(media * perfiles * fatiga, desviacion), 0, None)
+            columnas.append(np.rint(valores) if metrica in COUNT_METRICS else np.round(valores, 2))
+        for i, jugador in enumerate(jugadores):
+            fila = ';'.join(f"{c[i]:g}" for c in columnas)
+            lineas.append(f"{jugador};{rival} - {nombre_periodo};{numero};{fila}")
+    return ('\n'.join(lineas) + '\n').encode('utf-8')
+
+
+def season(players, matches, seed=0, inicio=datetime.date(2024, 8, 17), dias_entre=7):
+    """Genera (nombre de archivo, bytes) para `matches` partidos de una plantilla de `players`.
+
+    En cada partido juegan entre el 70 % y el 100 % de la plantilla.
+    """
+    rng = np.random.default_rng(seed)
+    plantilla = [f"Jugador {i:03d}" for i in range(players)]
+    perfiles = rng.uniform(0.8, 1.2, players)
+    for m in range(matches):
+        fecha = inicio + datetime.timedelta(days=m * dias_entre)
+        rival = f"RIVAL{m:03d}"
+        n = max(1, int(players * rng.uniform(0.7, 1.0)))
+        elegidos = np.sort(rng.choice(players, n, replace=False))
+        datos = match_csv(rival, [plantilla[i] for i in elegidos], rng, perfiles[elegidos])
+        yield f"{rival}_{fecha:%Y_%m_%d}.csv", datos
+
+
+class MemoryFile(io.BytesIO):
+    """Archivo en memoria con la interfaz de `st.file_uploader` (`name`, `getvalue`)."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def write_season(carpeta, players, matches, seed=0):
+    os.makedirs(carpeta, exist_ok=True)
+    rutas = []
+    for nombre, datos in season(players, matches, seed):
+        ruta = os.path.join(carpeta, nombre)
+        with open(ruta, 'wb') as f:
+            f.write(datos)
+        rutas.append(ruta)
+    return rutas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("carpeta")
+    parser.add_argument("--players", type=int, default=25)
+    parser.add_argument("--matches", type=int, default=38)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rutas = write_season(args.carpeta, args.players, args.matches, args.seed)
+    print(f"{len(rutas)} partidos de {args.players} jugadores en {args.carpeta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
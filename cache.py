@@ -0,0 +1,287 @@
+"""Cachés compartidas por todas las sesiones del proceso.
+
+Streamlit atiende a todas las sesiones desde un mismo proceso, así que una
+caché a nivel de módulo ya es compartida: el cuerpo técnico y el médico que
+abren el mismo partido reutilizan el mismo parseo, los mismos agregados y los
+mismos PNG. Las claves son hashes de contenido, nunca datos de la sesión.
+
+- `LRUCache` se acota por entradas, y `get_or_compute` evita que dos
+  sesiones calculen a la vez el mismo valor (la segunda espera al resultado
+  de la primera).
+- Todas las `LRUCache` comparten un único tope de bytes (`MemoryBudget`,
+  `GPS_CACHE_MB` para el proceso entero): al superarse se expulsa la entrada
+  usada hace más tiempo, sea de la caché que sea.
+- `DiskCache` es un segundo nivel opcional en disco (`GPS_CACHE_DIR`), que
+  sobrevive a reinicios y se comparte entre procesos (p. ej. varias réplicas
+  o la CLI). Las claves son solo hashes de contenido, así que cada caché en
+  disco lleva la versión de su formato en la carpeta (`open_disk_cache`).
+"""
+import hashlib
+import itertools
+import os
+import pickle
+import shutil
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Tope de memoria de todas las cachés del proceso juntas (MB); 0 = solo por número de entradas
+CACHE_MB = float(os.environ.get("GPS_CACHE_MB", "512"))
+
+# Carpeta del nivel en disco; vacío = sin disco
+CACHE_DIR = os.environ.get("GPS_CACHE_DIR", "")
+DISK_CACHE_MB = float(os.environ.get("GPS_DISK_CACHE_MB", "2048"))
+
+
+def sizeof(valor):
+    """Tamaño aproximado en bytes de un valor cacheado."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if hasattr(valor, 'to_plotly_json'):
+        # Figuras de Plotly: sus trazas y layout como dicts, sin serializar a JSON
+        return sizeof(valor.to_plotly_json())
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(sizeof(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(sizeof(v) for v in valor)
+    return sys.getsizeof(valor)
+
+
+class DiskCache:
+    """Nivel en disco: un archivo pickle por clave, acotado por bytes totales.
+
+    Las escrituras son atómicas (archivo temporal + `os.replace`), así que
+    varios procesos pueden compartir la carpeta; la expulsión borra los
+    archivos con acceso más antiguo.
+    """
+
+    def __init__(self, root, max_bytes=DISK_CACHE_MB * 2 ** 20):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, clave):
+        nombre = hashlib.blake2b(repr(clave).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.root, f"{nombre}.pkl")
+
+    def get(self, clave):
+        path = self._path(clave)
+        try:
+            with open(path, 'rb') as f:
+                valor = pickle.load(f)
+            os.utime(path)
+            return valor
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, clave, valor):
+        path = self._path(clave)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+        self._evict()
+
+    def _evict(self):
+        archivos = []
+        for entrada in os.scandir(self.root):
+            if entrada.name.endswith('.pkl'):
+                info = entrada.stat()
+                archivos.append((info.st_atime, info.st_size, entrada.path))
+        total = sum(a[1] for a in archivos)
+        for _, tamano, path in sorted(archivos):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= tamano
+            except OSError:
+                pass
+
+
+def open_disk_cache(nombre, version=None, root=CACHE_DIR):
+    """Subcarpeta `nombre` (o `nombre-v<version>`) del nivel en disco, o None si está desactivado.
+
+    Con `version`, las carpetas de otras versiones de la misma caché se borran:
+    sus valores tienen un formato que el código actual ya no produce.
+    """
+    if not root:
+        return None
+    if version is None:
+        return DiskCache(os.path.join(root, nombre))
+    carpeta = f"{nombre}-v{version}"
+    if os.path.isdir(root):
+        for entrada in os.scandir(root):
+            anterior = entrada.name == nombre or entrada.name.startswith(f"{nombre}-v")
+            if entrada.is_dir() and anterior and entrada.name != carpeta:
+                shutil.rmtree(entrada.path, ignore_errors=True)
+    return DiskCache(os.path.join(root, carpeta))
+
+
+class MemoryBudget:
+    """Tope de bytes común a varias `LRUCache`.
+
+    Cada acceso a una entrada recibe un número creciente; cuando el total de
+    las cachés supera el tope, se expulsa la entrada con el número más bajo
+    entre todas, es decir, la usada hace más tiempo en todo el proceso.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes or None
+        self._caches = weakref.WeakSet()
+        self._ticks = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def bytes(self):
+        return sum(c.bytes for c in list(self._caches))
+
+    def register(self, cache):
+        self._caches.add(cache)
+
+    def tick(self):
+        return next(self._ticks)
+
+    def enforce(self):
+        """Expulsa entradas hasta volver al tope (cada caché conserva su última entrada)."""
+        if not self.max_bytes:
+            return
+        with self._lock:
+            caches = list(self._caches)
+            total = sum(c.bytes for c in caches)
+            while total > self.max_bytes:
+                candidatas = [(c._oldest_tick(), id(c), c) for c in caches]
+                candidatas = [x for x in candidatas if x[0] is not None]
+                if not candidatas:
+                    break
+                total -= min(candidatas)[2]._evict_oldest()
+
+
+# Un solo tope para todas las cachés del proceso
+MEMORY_BUDGET = MemoryBudget(CACHE_MB * 2 ** 20)
+
+
+class LRUCache:
+    """Caché LRU acotada por número de entradas y por el tope de bytes compartido, segura entre hilos."""
+
+    def __init__(self, max_entries, budget=MEMORY_BUDGET, disk=None):
+        self.max_entries = max_entries
+        self.budget = budget
+        self.disk = disk
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._ticks = {}
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        if budget is not None:
+            budget.register(self)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, clave):
+        return clave in self._items
+
+    def get(self, clave):
+        with self._lock:
+            valor = self._items.get(clave)
+            if valor is not None:
+                self._items.move_to_end(clave)
+                self._touch(clave)
+                self.hits += 1
+                return valor
+        valor = self.disk.get(clave) if self.disk is not None else None
+        with self._lock:
+            if valor is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._store(clave, valor)
+        return valor
+
+    def put(self, clave, valor):
+        self._store(clave, valor)
+        if self.disk is not None:
+            self.disk.put(clave, valor)
+
+    def _touch(self, clave):
+        if self.budget is not None:
+            self._ticks[clave] = self.budget.tick()
+
+    def _store(self, clave, valor):
+        medir = self.budget is not None and self.budget.max_bytes
+        tamano = sizeof(valor) if medir else 0
+        with self._lock:
+            self.bytes += tamano - self._sizes.get(clave, 0)
+            self._items[clave] = valor
+            self._sizes[clave] = tamano
+            self._items.move_to_end(clave)
+            self._touch(clave)
+            while len(self._items) > self.max_entries:
+                self._pop_oldest()
+        # Fuera del candado de la caché: el tope común toma los candados de todas
+        if medir:
+            self.budget.enforce()
+
+    def _pop_oldest(self):
+        viejo, _ = self._items.popitem(last=False)
+        self._ticks.pop(viejo, None)
+        tamano = self._sizes.pop(viejo, 0)
+        self.bytes -= tamano
+        return tamano
+
+    def _oldest_tick(self):
+        """Número de acceso de la entrada más antigua, o None si no se puede expulsar ninguna."""
+        with self._lock:
+            # Siempre se conserva la última entrada, aunque supere el tope de bytes
+            if len(self._items) < 2:
+                return None
+            return self._ticks.get(next(iter(self._items)), -1)
+
+    def _evict_oldest(self):
+        with self._lock:
+            return self._pop_oldest() if len(self._items) > 1 else 0
+
+    def get_or_compute(self, clave, compute):
+        """Valor de `clave`; si falta, lo calcula una sola vez aunque lo pidan varios hilos."""
+        valor = self.get(clave)
+        if valor is not None:
+            return valor
+        with self._lock:
+            evento = self._pending.get(clave)
+            propio = evento is None
+            if propio:
+                evento = self._pending[clave] = threading.Event()
+        if not propio:
+            evento.wait()
+            valor = self.get(clave)
+            if valor is not None:
+                return valor
+            return compute()
+        try:
+            valor = compute()
+            if valor is not None:
+                self.put(clave, valor)
+            return valor
+        finally:
+            with self._lock:
+                del self._pending[clave]
+            evento.set()
@@ -0,0 +1,153 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from cache import LRUCache, open_disk_cache
+
+# Configuración de imagen
+IMAGE_FORMAT = "png"
+IMAGE_WIDTH = 700
+IMAGE_HEIGHT = 500
+
+# Hilos de renderizado (cada uno con su propio proceso de Kaleido);
+# con GPS_RENDER_WORKERS=0 se renderiza en el hilo actual
+RENDER_WORKERS = int(os.environ.get("GPS_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+MAX_IMAGENES_CACHE = 256
+
+_local = threading.local()
+
+
+def data_digest(df):
+    """Hash del contenido de un DataFrame (valores e índice), para memoizar gráficos."""
+    valores = pd.util.hash_pandas_object(df, index=True).values
+    return hashlib.blake2b(valores.tobytes(), digest_size=16).hexdigest()
+
+
+def _scope():
+    """Scope de Kaleido del hilo actual, o None si la versión instalada no lo expone."""
+    if not hasattr(_local, "scope"):
+        try:
+            import plotly
+            from kaleido.scopes.plotly import PlotlyScope
+            # Misma copia de plotly.js que usa plotly.io, sin MathJax (no hay fórmulas)
+            plotlyjs = os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+            _local.scope = PlotlyScope(plotlyjs=plotlyjs, mathjax=False)
+        except ImportError:
+            _local.scope = None
+    return _local.scope
+
+
+def _flatten_png(png):
+    """Quita el canal alfa: FPDF decodifica los PNG RGBA píxel a píxel en Python."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return png
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(png)).convert('RGB').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def render_png(fig):
+    """Rasteriza una figura a PNG (RGB) en memoria, sin pasar por disco."""
+    scope = _scope()
+    if scope is not None:
+        png = scope.transform(fig.to_dict(), format=IMAGE_FORMAT, width=IMAGE_WIDTH, height=IMAGE_HEIGHT)
+    else:
+        import plotly.io as pio
+        png = pio.to_image(fig, format=IMAGE_FORMAT, width=IMAGE_WIDTH, height=IMAGE_HEIGHT)
+    return _flatten_png(png)
+
+
+class ChartRenderer:
+    """Renderiza figuras a PNG en un pool de hilos, con caché LRU de los bytes.
+
+    Kaleido serializa las peticiones a su proceso de Chromium, así que cada hilo
+    del pool usa su propio scope (y su propio Chromium); los hilos se mantienen
+    vivos y los informes siguientes no vuelven a pagar el arranque.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, max_entries=MAX_IMAGENES_CACHE, disk=None):
+        self.workers = workers
+        self.cache = LRUCache(max_entries, disk=disk)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None and self.workers > 0:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="kaleido")
+            return self._pool
+
+    def render(self, charts, progress=None):
+        """Rasteriza `charts`, lista de (clave, build) con `build()` -> go.Figure.
+
+        Devuelve una lista con los bytes PNG de cada gráfico (o la excepción si
+        falló), en el mismo orden. Las claves ya renderizadas no se recalculan
+        y sus figuras ni siquiera se construyen. `progress(hechos, total)`, si
+        se pasa, se llama cada vez que termina un gráfico.
+        """
+        resultados = [self.cache.get(clave) for clave, _ in charts]
+        pendientes = [i for i, png in enumerate(resultados) if png is None]
+        pool = self._executor() if pendientes else None
+        hechos = len(charts) - len(pendientes)
+
+        def avanzar():
+            nonlocal hechos
+            hechos += 1
+            if progress is not None:
+                progress(hechos, len(charts))
+
+        if progress is not None:
+            progress(hechos, len(charts))
+        futuros = {}
+        for i in pendientes:
+            try:
+                fig = charts[i][1]()
+            except Exception as e:
+                resultados[i] = e
+                avanzar()
+                continue
+            if pool is not None:
+                futuros[pool.submit(render_png, fig)] = i
+            else:
+                resultados[i] = self._render_local(fig)
+                avanzar()
+
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                resultados[i] = futuro.result()
+            except Exception as e:
+                resultados[i] = e
+            avanzar()
+
+        for i in pendientes:
+            if isinstance(resultados[i], bytes):
+                self.cache.put(charts[i][0], resultados[i])
+        return resultados
+
+    @staticmethod
+    def _render_local(fig):
+        try:
+            return render_png(fig)
+        except Exception as e:
+            return e
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Renderizador compartido por el proceso (el pool se crea al primer uso)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer(disk=open_disk_cache("imagenes"))
+        return _renderer
@@ -0,0 +1,147 @@
+"""Generación de informes GPS sin Streamlit.
+
+Lee todos los CSV de una carpeta y escribe, para cada partido, el informe del
+equipo y uno por jugador:
+
+    python cli.py carpeta_csv --out informes --lang Español --jobs 4
+
+Los partidos se reparten entre procesos. Los gráficos se dibujan como vectores
+con FPDF; Plotly y Kaleido solo se importan con GPS_PDF_CHARTS=png.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import (
+    LABELS, LANGUAGES, METRICS, PDF_CHARTS, get_grouped_metrics, get_metric_definitions, get_metrics, group_averages,
+    match_options, report_charts
+)
+from cube import TODOS
+from derived import with_derived
+from fatigue import half_rows, half_summary, half_table
+from ingest import LocalFile, MatchFrame, ingest_files
+from naming import unique_filename
+from report import ReportBuilder
+
+_renderer = None
+
+
+def _process_renderer():
+    # Un solo Kaleido por proceso: el paralelismo ya viene del pool de procesos
+    global _renderer
+    if _renderer is None:
+        from charts import ChartRenderer
+        _renderer = ChartRenderer(workers=0)
+    return _renderer
+
+
+def write_match_reports(tarea):
+    """Escribe el informe del equipo y los de cada jugador de un partido.
+
+    `tarea` es un dict con lang, partido, fecha, equipo (agregados del cubo),
+    tiempos (perfil primer / segundo tiempo del partido, ver fatigue.py), out_dir
+    y charts. Devuelve (partido, archivos escritos, errores de gráficos).
+    """
+    labels = LABELS[tarea["lang"]]
+    definitions = get_metric_definitions(labels)
+    metrics = get_metrics(labels)
+    grouped_metrics = get_grouped_metrics(labels)
+    equipo = tarea["equipo"]
+    partido, fecha = tarea["partido"], tarea["fecha"]
+
+    bar_chart_images, errores = [], []
+    if tarea["charts"]:
+        renderer = _process_renderer() if PDF_CHARTS == "png" else None
+        bar_chart_images, errores = report_charts(equipo['sum'], grouped_metrics, metrics, renderer)
+
+    carpeta = os.path.join(tarea["out_dir"], tarea["carpeta"])
+    os.makedirs(carpeta, exist_ok=True)
+    medias = equipo['mean'][[c for c in metrics.values() if c in equipo['mean'].columns]]
+    informes = [(labels["pdf_file"], TODOS, labels["all"], medias)]
+    # Nombres únicos en la carpeta, contando el informe del equipo
+    usados = {os.path.splitext(labels["pdf_file"])[0].lower()}
+    informes += [
+        (f"{unique_filename(nombre, usados, 'informe')}.pdf", nombre, nombre, medias.loc[[nombre]])
+        for nombre in medias.index
+    ]
+
+    with ReportBuilder(labels, definitions, bar_chart_images) as builder:
+        for archivo, jugador, nombre, datos in informes:
+            resumen = {"Partido": partido, "Fecha": fecha, "Jugador": nombre}
+            mitades = half_rows(half_summary(tarea["tiempos"], partido, jugador), metrics)
+            with open(os.path.join(carpeta, archivo), 'wb') as f:
+                builder.write(f, labels["pdf_title"], resumen, group_averages(datos, grouped_metrics, metrics), mitades)
+    return partido, len(informes), [(k, str(e)) for k, e in errores]
+
+
+def match_tasks(cube, lang, out_dir, periodo=TODOS, charts=True):
+    """Una tarea por partido con los agregados ya calculados (poco costosas de enviar a otro proceso)."""
+    tareas = []
+    # Los informes llevan todas las métricas del registro, derivadas incluidas
+    tiempos = half_table(cube, list(METRICS))
+    carpetas = set()
+    for partido in match_options(cube.matches()):
+        equipo = with_derived(cube.lookup(partido, periodo), list(METRICS))
+        if equipo.empty:
+            continue
+        tareas.append({
+            "lang": lang,
+            "partido": partido,
+            "fecha": cube.date(partido),
+            "equipo": equipo,
+            "tiempos": tiempos[tiempos.index.get_level_values(0) == partido],
+            "out_dir": out_dir,
+            "carpeta": unique_filename(partido, carpetas, 'informe'),
+            "charts": charts,
+        })
+    return tareas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera los informes PDF de una carpeta de CSV de partidos.")
+    parser.add_argument("carpeta", help="carpeta con los CSV exportados (delimitados por ';')")
+    parser.add_argument("--out", default="informes", help="carpeta de salida (por defecto: informes)")
+    parser.add_argument("--lang", choices=LANGUAGES, default=LANGUAGES[0])
+    parser.add_argument("--half", type=int, choices=[1, 2], help="solo el primer o segundo tiempo")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="procesos en paralelo")
+    parser.add_argument("--no-charts", action="store_true", help="informes sin gráficos")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    paths = sorted(glob.glob(os.path.join(args.carpeta, "*.csv")))
+    if not paths:
+        print(f"No hay archivos CSV en {args.carpeta}", file=sys.stderr)
+        return 1
+
+    match_frame = MatchFrame()
+    ingest_files([LocalFile(p) for p in paths], match_frame)
+    tareas = match_tasks(match_frame.cube, args.lang, args.out, args.half or TODOS, not args.no_charts)
+
+    total = 0
+    if args.jobs > 1 and len(tareas) > 1:
+        with ProcessPoolExecutor(min(args.jobs, len(tareas))) as pool:
+            futuros = [pool.submit(write_match_reports, t) for t in tareas]
+            resultados = (f.result() for f in as_completed(futuros))
+            total = _print_results(resultados)
+    else:
+        total = _print_results(write_match_reports(t) for t in tareas)
+
+    print(f"{total} informes de {len(tareas)} partidos en {time.perf_counter() - inicio:.1f}s -> {args.out}")
+    return 0
+
+
+def _print_results(resultados):
+    total = 0
+    for partido, n, errores in resultados:
+        total += n
+        print(f"{partido}: {n} informes")
+        for k, e in errores:
+            print(f"  No se pudo generar el gráfico de {k}: {e}", file=sys.stderr)
+    return total
+
+
+if __name__ == "__main__":
+    sys.exit(main())
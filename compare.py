@@ -0,0 +1,106 @@
+"""Comparación de jugadores entre partidos: percentiles, z-scores y deltas.
+
+Parte de los valores por (partido, jugador) del cubo (`AggregateCube.by_match`)
+y calcula todo con operaciones agrupadas sobre la temporada completa, sin
+bucles por jugador ni por métrica:
+
+- `percentil`: rango percentil del jugador dentro de la plantilla en ese partido;
+- `z_equipo`: z-score frente a la media y desviación de la plantilla en ese partido;
+- `z_personal`: z-score frente a sus propios partidos anteriores (al menos
+  `MIN_BASELINE` partidos previos);
+- `delta`: diferencia con su partido anterior.
+
+El resultado se memoriza por contenido del cubo y tiempo, así que cambiar de
+jugador o métrica en la vista es solo una selección sobre la tabla. Las
+métricas derivadas solo se comparan si se piden (`ids`); cada columna se
+compara por separado, así que se calculan aparte y se añaden a la tabla base.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from cube import TODOS
+from derived import derived_ids, evaluate
+
+FIELDS = ['valor', 'percentil', 'z_equipo', 'z_personal', 'delta']
+
+# Partidos previos necesarios para la línea base personal
+MIN_BASELINE = 3
+
+MAX_COMPARACIONES_CACHE = 16
+
+_cache = LRUCache(MAX_COMPARACIONES_CACHE)
+
+
+def comparison_cache():
+    """Caché de tablas de comparación, por clave del cubo (y métricas derivadas)."""
+    return _cache
+
+
+def _zscore(valores, media, desviacion):
+    return (valores - media) / desviacion.where(desviacion > 0)
+
+
+def compare(valores, min_baseline=MIN_BASELINE):
+    """Comparaciones de `valores` (índice (partido, jugador) en orden cronológico, columnas métricas).
+
+    Devuelve un DataFrame con el mismo índice y columnas (métrica, campo).
+    """
+    # Un solo bloque float64: las operaciones siguientes recorren una matriz, no una columna por vez
+    valores = pd.DataFrame(valores.to_numpy(np.float64), index=valores.index, columns=valores.columns)
+    partidos = valores.groupby(level=0, sort=False, observed=True)
+    jugadores = valores.groupby(level=1, sort=False, observed=True)
+
+    percentil = partidos.rank(pct=True) * 100
+    z_equipo = _zscore(valores, partidos.transform('mean'), partidos.transform('std'))
+
+    # Línea base con los partidos anteriores de cada jugador: sumas acumuladas menos el actual
+    presentes = valores.notna()
+    x = valores.fillna(0.0)
+    previos = presentes.astype(np.float64).groupby(level=1, sort=False, observed=True).cumsum() - presentes
+    suma = x.groupby(level=1, sort=False, observed=True).cumsum() - x
+    cuadrados = (x * x).groupby(level=1, sort=False, observed=True).cumsum() - x * x
+    base = previos.where(previos >= max(min_baseline, 2))
+    media = suma / base
+    varianza = ((cuadrados - base * media * media) / (base - 1)).clip(lower=0)
+    z_personal = _zscore(valores, media, np.sqrt(varianza))
+
+    delta = jugadores.diff()
+
+    tabla = pd.concat(
+        {'valor': valores, 'percentil': percentil, 'z_equipo': z_equipo, 'z_personal': z_personal, 'delta': delta},
+        axis=1
+    )
+    columnas = pd.MultiIndex.from_product([valores.columns, FIELDS])
+    return tabla.swaplevel(axis=1)[columnas]
+
+
+def comparison_table(cube, periodo=TODOS, ids=None):
+    """`compare` sobre los partidos del cubo para `periodo`, memorizado por contenido del cubo.
+
+    Incluye las derivadas de `ids` (None = todas).
+    """
+    clave = (cube.key(), periodo)
+    base = _cache.get_or_compute(clave, lambda: compare(cube.by_match(periodo)))
+    ids = derived_ids(ids)
+    if not ids:
+        return base
+
+    def combinar():
+        derivadas = compare(evaluate(cube.by_match(periodo), ids))
+        return pd.concat([base, derivadas], axis=1)
+    return _cache.get_or_compute(clave + (ids,), combinar)
+
+
+def squad_ranks(valores):
+    """Percentil y z-score de cada jugador frente a la plantilla (índice jugador, columnas métricas).
+
+    Sirve para los promedios de la temporada, donde no hay partidos que comparar.
+    """
+    valores = valores.astype(np.float64)
+    tabla = pd.concat({
+        'valor': valores,
+        'percentil': valores.rank(pct=True) * 100,
+        'z_equipo': _zscore(valores, valores.mean(), valores.std()),
+    }, axis=1)
+    return tabla.swaplevel(axis=1)[pd.MultiIndex.from_product([valores.columns, FIELDS[:3]])]
@@ -0,0 +1,433 @@
+import os
+from functools import partial
+
+import pandas as pd
+
+from cache import LRUCache
+from charts import data_digest, get_renderer
+from derived import DERIVED_METRICS
+
+LANGUAGES = ["English", "Español"]
+
+# Figuras de Plotly ya construidas, por (métrica, datos, idioma)
+MAX_FIGURAS_CACHE = 128
+
+# Gráficos del PDF: "vector" los dibuja FPDF a partir de los datos (ver report.py, sin Kaleido ni
+# navegador); "png" los rasteriza con Kaleido como en pantalla
+PDF_CHARTS = os.environ.get("GPS_PDF_CHARTS", "vector")
+
+# A partir de este número de jugadores la vista por defecto es por grupo y con top-N
+LARGE_SQUAD = 30
+CHART_LIMITS = [5, 10, 15, 20, 30]
+
+# Traducción de etiquetas
+LABELS = {
+    "English": {
+        "title": "Match GPS Report",
+        "upload": "Upload match CSV files",
+        "match": "Match",
+        "half": "Half",
+        "player": "Player",
+        "first_half": "First Half",
+        "second_half": "Second Half",
+        "all": "All",
+        "averages": "Player(s) Averages",
+        "distance": "Total Distance (m)",
+        "tempo": "Tempo Distance (m)",
+        "hsr": "HSR Distance (m)",
+        "sprint": "Sprint Distance (m)",
+        "sprint_count": "Number of Sprints",
+        "max_speed": "Max Speed (m/s)",
+        "acc": "Accelerations (#)",
+        "dec": "Decelerations (#)",
+        "load": "Player Load",
+        "rhie": "RHIE Count",
+        "create_pdf": "Generate PDF Report",
+        "create_zip": "Generate Squad Reports (ZIP)",
+        "zip_file": "gps_reports.zip",
+        "download_report": "Download",
+        "stored_matches": "Saved matches",
+        "remove_matches": "Matches to remove",
+        "remove": "Remove",
+        "job_pendiente": "queued",
+        "job_en_curso": "rendering",
+        "upload_raw": "Upload raw 10 Hz traces (optional)",
+        "peaks": "Peak Demands (Worst Case Scenario)",
+        "window": "Window (min)",
+        "acc_dec": "Acc/Dec Efforts (#)",
+        "workload": "Acute:Chronic Workload Ratio (ACWR)",
+        "workload_metric": "Load metric",
+        "workload_method": "Method",
+        "ewma": "EWMA (7/28 days)",
+        "rolling": "Rolling average (7/28 days)",
+        "latest": "Latest ACWR",
+        "metric_group": "Metric group",
+        "chart_view": "Chart view",
+        "view_all": "All charts",
+        "view_group": "Selected group only",
+        "view_on_demand": "On demand",
+        "show_chart": "Show chart",
+        "players_per_chart": "Players per chart",
+        "top": "Highest",
+        "bottom": "Lowest",
+        "compare": "Player Comparison",
+        "compare_metric": "Metric to compare",
+        "valor": "Value",
+        "percentil": "Squad percentile",
+        "z_equipo": "Z-score vs squad",
+        "z_personal": "Z-score vs own history",
+        "delta": "Change vs previous match",
+        "halves": "First Half vs Second Half",
+        "halves_metric": "Metric for the halves comparison",
+        "primero": "1st half",
+        "segundo": "2nd half",
+        "cambio": "Change",
+        "cambio_pct": "Change (%)",
+        "halves_history": "Change between halves per match (%)",
+        "halves_no_data": "No first and second half data for this selection.",
+        "avg_of": "Average of",
+        "Carga": "Load",
+        "Velocidad e Intensidad": "Speed & Intensity",
+        "Aceleración y Desaceleración": "Acceleration & Deceleration",
+        "Distancias": "Distances",
+        "Esfuerzos Repetidos": "Repeated High-Intensity Efforts",
+        "Derivadas": "Derived Metrics",
+        "minutes": "Minutes Played",
+        "distance_min": "Distance per Minute (m/min)",
+        "distance_90": "Distance per 90 (m)",
+        "hsr_sprint": "HSR + Sprint Distance (m)",
+        "hsr_sprint_90": "HSR + Sprint per 90 (m)",
+        "hi_ratio": "High-Intensity Share (%)",
+        "load_min": "Player Load per Minute",
+        "acc_dec_90": "Acc + Dec per 90 (#)",
+        "pdf_title": "Team GPS Report",
+        "pdf_file": "gps_report.pdf",
+        "Fecha": "Date",
+        "Partido": "Match",
+        "Jugador": "Player"
+    },
+    "Español": {
+        "title": "Informe GPS del Partido",
+        "upload": "Sube archivos CSV del partido",
+        "match": "Partido",
+        "half": "Tiempo",
+        "player": "Jugador",
+        "first_half": "Primer Tiempo",
+        "second_half": "Segundo Tiempo",
+        "all": "Todos",
+        "averages": "Promedios del(los) Jugador(es)",
+        "distance": "Distancia Total (m)",
+        "tempo": "Distancia en Tempo (m)",
+        "hsr": "Distancia HSR (m)",
+        "sprint": "Distancia en Sprint (m)",
+        "sprint_count": "N° de Sprints",
+        "max_speed": "Velocidad Máxima (m/s)",
+        "acc": "Aceleraciones (#)",
+        "dec": "Desaceleraciones (#)",
+        "load": "Carga del Jugador",
+        "rhie": "Esfuerzos Repetidos Alta Intensidad",
+        "create_pdf": "Crear Informe PDF",
+        "create_zip": "Crear Informes por Jugador (ZIP)",
+        "zip_file": "informes_gps.zip",
+        "download_report": "Descargar",
+        "stored_matches": "Partidos guardados",
+        "remove_matches": "Partidos a quitar",
+        "remove": "Quitar",
+        "job_pendiente": "en cola",
+        "job_en_curso": "generando",
+        "upload_raw": "Sube trazas crudas de 10 Hz (opcional)",
+        "peaks": "Demandas Máximas (Worst Case Scenario)",
+        "window": "Ventana (min)",
+        "acc_dec": "Esfuerzos Acc/Dec (#)",
+        "workload": "Relación de Carga Aguda:Crónica (ACWR)",
+        "workload_metric": "Métrica de carga",
+        "workload_method": "Método",
+        "ewma": "EWMA (7/28 días)",
+        "rolling": "Media móvil (7/28 días)",
+        "latest": "ACWR más reciente",
+        "metric_group": "Grupo de métricas",
+        "chart_view": "Vista de gráficos",
+        "view_all": "Todos los gráficos",
+        "view_group": "Solo el grupo elegido",
+        "view_on_demand": "Bajo demanda",
+        "show_chart": "Mostrar gráfico",
+        "players_per_chart": "Jugadores por gráfico",
+        "top": "Más altos",
+        "bottom": "Más bajos",
+        "compare": "Comparación de Jugadores",
+        "compare_metric": "Métrica a comparar",
+        "valor": "Valor",
+        "percentil": "Percentil en la plantilla",
+        "z_equipo": "Z-score vs plantilla",
+        "z_personal": "Z-score vs su historial",
+        "delta": "Cambio vs partido anterior",
+        "halves": "Primer Tiempo vs Segundo Tiempo",
+        "halves_metric": "Métrica para comparar los tiempos",
+        "primero": "1er tiempo",
+        "segundo": "2º tiempo",
+        "cambio": "Cambio",
+        "cambio_pct": "Cambio (%)",
+        "halves_history": "Cambio entre tiempos por partido (%)",
+        "halves_no_data": "No hay datos de primer y segundo tiempo para esta selección.",
+        "avg_of": "Promedio de",
+        "Carga": "Carga",
+        "Velocidad e Intensidad": "Velocidad e Intensidad",
+        "Aceleración y Desaceleración": "Aceleración y Desaceleración",
+        "Distancias": "Distancias",
+        "Esfuerzos Repetidos": "Esfuerzos Repetidos",
+        "Derivadas": "Métricas Derivadas",
+        "minutes": "Minutos Jugados",
+        "distance_min": "Distancia por Minuto (m/min)",
+        "distance_90": "Distancia por 90 (m)",
+        "hsr_sprint": "Distancia HSR + Sprint (m)",
+        "hsr_sprint_90": "HSR + Sprint por 90 (m)",
+        "hi_ratio": "Proporción en Alta Intensidad (%)",
+        "load_min": "Carga por Minuto",
+        "acc_dec_90": "Acc + Dec por 90 (#)",
+        "pdf_title": "Informe GPS del Equipo",
+        "pdf_file": "informe_gps.pdf",
+        "Fecha": "Fecha",
+        "Partido": "Partido",
+        "Jugador": "Jugador"
+    }
+}
+
+
+# Registro de métricas: id interno estable -> columna del CSV (o de derived.py), en orden de pantalla.
+# Los cálculos y cachés usan ids y columnas; la traducción solo se aplica al mostrar.
+METRICS = {
+    "distance": 'Work Rate Total Dist',
+    "tempo": 'Tempo Distance (Gen2)',
+    "hsr": 'HSR Eff Distance (Gen2)',
+    "sprint": 'Sprint Eff Distance (Gen2)',
+    "sprint_count": 'Sprint Eff Count (Gen2)',
+    "max_speed": 'Max Velocity',
+    "acc": 'Acc Eff Count (Gen2)',
+    "dec": 'Dec Eff Count (Gen2)',
+    "load": 'Player Load',
+    "peak_load": 'Peak Player Load',
+    "work_time": 'Player Load Work Time',
+    "rest_time": 'Player Load Rest Time',
+    "work_rest": 'Player Load Work:Rest',
+    "velocity_exertion": 'Velocity Exertion',
+    "velocity_exertion_min": 'Velocity Exertion Per Min',
+    "acc_load": 'Acceleration Load',
+    "acc_density": 'Acceleration Density Index',
+    "rhie": 'RHIE Total Bouts',
+}
+# Las derivadas se calculan bajo demanda con su id como nombre de columna (ver derived.py)
+METRICS.update({i: i for i in DERIVED_METRICS})
+
+# Grupos de métricas (resúmenes y PDF); los ids de grupo son claves de LABELS
+METRIC_GROUPS = {
+    "Carga": ["load", "peak_load", "work_time", "rest_time", "work_rest"],
+    "Velocidad e Intensidad": ["max_speed", "velocity_exertion", "velocity_exertion_min"],
+    "Aceleración y Desaceleración": ["acc", "dec", "acc_load", "acc_density"],
+    "Distancias": ["distance", "tempo", "hsr", "sprint", "sprint_count"],
+    "Esfuerzos Repetidos": ["rhie"],
+    "Derivadas": list(DERIVED_METRICS),
+}
+
+# Nombre de las métricas sin traducción en LABELS (iguales en todos los idiomas)
+METRIC_NAMES = {
+    "peak_load": "Peak Player Load",
+    "work_time": "Player Load Work Time",
+    "rest_time": "Player Load Rest Time",
+    "work_rest": "Player Load Work:Rest",
+    "velocity_exertion": "Velocity Exertion",
+    "velocity_exertion_min": "Velocity Exertion Per Min",
+    "acc_load": "Acceleration Load",
+    "acc_density": "Acceleration Density Index",
+}
+
+# Definiciones de métricas
+METRIC_DEFINITIONS = {
+    "distance": "Total distance covered during the match.",
+    "tempo": "Distance covered at moderate intensity (~15–20 km/h).",
+    "hsr": "Distance covered between 20 and 25 km/h.",
+    "sprint": "Distance covered above 25 km/h.",
+    "sprint_count": "Number of sprints above 25 km/h lasting at least 1s.",
+    "max_speed": "Maximum speed reached during the match.",
+    "acc": "Number of effective accelerations (>1.5 m/s²).",
+    "dec": "Number of effective decelerations (<-1.5 m/s²).",
+    "load": "Cumulative load based on all movement intensities.",
+    "rhie": "Repeated high-intensity efforts (sprint, acc, dec).",
+    "peak_load": "Maximum load recorded in a short period.",
+    "work_time": "Total time under physical effort contributing to load.",
+    "rest_time": "Total time of recovery or inactivity during the session.",
+    "work_rest": "Ratio between work time and rest time.",
+    "velocity_exertion": "Effort exerted considering intensity and velocity changes.",
+    "velocity_exertion_min": "Velocity-based exertion per minute of activity.",
+    "acc_load": "Load accumulated from acceleration efforts.",
+    "acc_density": "Frequency and density of acceleration actions.",
+    "minutes": "Minutes on the field (work time + rest time).",
+    "distance_min": "Total distance per minute played.",
+    "distance_90": "Total distance normalized to 90 minutes.",
+    "hsr_sprint": "HSR distance plus sprint distance (above 20 km/h).",
+    "hsr_sprint_90": "HSR + sprint distance normalized to 90 minutes.",
+    "hi_ratio": "Share of the total distance covered above 20 km/h.",
+    "load_min": "Player Load per minute played.",
+    "acc_dec_90": "Accelerations plus decelerations per 90 minutes.",
+}
+
+
+def metric_label(metric_id, labels):
+    """Nombre de la métrica en el idioma de `labels`."""
+    return labels.get(metric_id) or METRIC_NAMES.get(metric_id, metric_id)
+
+
+# Vistas traducidas del registro, con el nombre mostrado como clave (informes y CLI)
+def get_metric_definitions(labels):
+    return {metric_label(i, labels): d for i, d in METRIC_DEFINITIONS.items()}
+
+
+def get_metrics(labels):
+    return {metric_label(i, labels): c for i, c in METRICS.items()}
+
+
+def get_grouped_metrics(labels):
+    return {labels[g]: [metric_label(i, labels) for i in ids] for g, ids in METRIC_GROUPS.items()}
+
+
+def match_options(partidos):
+    """Partidos para elegir, ordenados.
+
+    Las etiquetas ya vienen normalizadas al ingresar (ver naming.py), así que
+    no hace falta filtrar las que incluyen el tiempo.
+    """
+    return sorted(set(str(p) for p in partidos))
+
+
+# Función de gráfico
+def neon_bar_chart(df, label, column, labels, definitions):
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(
+        x=df[column],
+        y=df['Player Name'],
+        orientation='h',
+        text=df[column].round(1),
+        textposition='outside',
+        marker=dict(color='rgba(255, 0, 51, 0.7)'),
+        hovertemplate=f'%{{y}}<br>{label}: %{{x}}<br>{definitions.get(label, "")}'
+    ))
+    fig.update_layout(
+        height=400,
+        xaxis_title=label or None,
+        yaxis_title=labels["player"] if labels else None,
+        plot_bgcolor='#0d0d0d',
+        paper_bgcolor='#0d0d0d',
+        font=dict(color='white', size=12)
+    )
+    return fig
+
+
+_figures = LRUCache(MAX_FIGURAS_CACHE)
+
+
+def figure_cache():
+    """Caché de figuras Plotly ya construidas."""
+    return _figures
+
+
+def chart_data(df_sums, column, top=None):
+    """Datos ordenados de un gráfico de barras y su clave de caché (sin el idioma).
+
+    Con `top` positivo se quedan los `top` jugadores con valores más altos; con
+    `top` negativo, los más bajos.
+    """
+    chart_df = df_sums[[column]].reset_index().sort_values(column, ascending=True)
+    if top:
+        chart_df = chart_df.dropna(subset=[column])
+        chart_df = chart_df.tail(top) if top > 0 else chart_df.head(-top)
+    return chart_df, (column, data_digest(chart_df))
+
+
+def cached_bar_chart(df_sums, label, column, labels, definitions, lang, top=None):
+    """`neon_bar_chart` memorizado por (métrica, datos filtrados, idioma).
+
+    Streamlit vuelve a serializar la figura en cada `st.plotly_chart`, pero una
+    figura ya validada cuesta mucho menos que construirla de nuevo: en un rerun
+    sin cambios en los filtros no se construye ninguna.
+    """
+    chart_df, clave = chart_data(df_sums, column, top)
+    clave += (lang,)
+    fig = _figures.get(clave)
+    if fig is None:
+        fig = neon_bar_chart(chart_df, label, column, labels, definitions)
+        _figures.put(clave, fig)
+    return fig
+
+
+def ordered_metrics(metrics, grouped_metrics, grupo=None, solo_grupo=False):
+    """Métricas en orden de pantalla: primero las del grupo elegido, luego el resto.
+
+    Con `solo_grupo` se devuelven solo las del grupo (el primero si no hay uno elegido).
+    """
+    if solo_grupo and grupo not in grouped_metrics:
+        grupo = next(iter(grouped_metrics), None)
+    primero = [k for k in grouped_metrics.get(grupo, []) if k in metrics]
+    if solo_grupo:
+        return primero
+    return primero + [k for k in metrics if k not in primero]
+
+
+def group_averages(df_grouped, grouped_metrics, metrics):
+    """Promedios por grupo de métricas para el resumen del PDF."""
+    resumen_avg = {}
+    for group, keys in grouped_metrics.items():
+        items = []
+        for k in keys:
+            col_key = metrics.get(k)
+            if col_key in df_grouped.columns:
+                val = df_grouped[col_key].mean()
+                if not pd.isna(val) and val != 0:
+                    items.append((k, val))
+        if items:
+            resumen_avg[group] = items
+    return resumen_avg
+
+
+def report_bar_chart(df_sums, column):
+    """Gráfico del PDF sin textos traducidos: el nombre de la métrica va en el título de la página."""
+    return neon_bar_chart(chart_data(df_sums, column)[0], "", column, None, {})
+
+
+def report_charts(df_sums, grouped_metrics, metrics, renderer=None, progress=None, backend=None):
+    """Gráficos del informe a partir de las sumas por jugador.
+
+    Con `backend` "vector" (`PDF_CHARTS` por defecto) cada gráfico es solo su
+    título y sus barras (jugador, valor) en orden de pantalla, y `ReportBuilder`
+    lo dibuja con primitivas de FPDF. Con "png" se rasterizan en paralelo y se
+    memorizan por (métrica, datos), sin el idioma: el mismo PNG sirve para los
+    informes en todos los idiomas.
+    Devuelve (gráficos, errores), con errores como lista de (métrica, excepción).
+    `progress(hechos, total)` recibe el avance por gráfico (ver `ChartRenderer.render`).
+    """
+    seleccion = [
+        (k, f"{group} - {k}", metrics[k])
+        for group, keys in grouped_metrics.items() for k in keys
+        if k in metrics and metrics[k] in df_sums.columns
+    ]
+    if (backend or PDF_CHARTS) == "vector":
+        bar_charts = []
+        for hechos, (k, titulo, column) in enumerate(seleccion, 1):
+            chart_df = chart_data(df_sums, column)[0]
+            barras = list(zip(chart_df['Player Name'].astype(str), chart_df[column].astype(float)))
+            bar_charts.append({"bars": barras, "title": titulo})
+            if progress:
+                progress(hechos, len(seleccion))
+        return bar_charts, []
+
+    charts, titulos = [], []
+    for k, titulo, column in seleccion:
+        charts.append((chart_data(df_sums, column)[1], partial(report_bar_chart, df_sums, column)))
+        titulos.append((k, titulo))
+
+    bar_chart_images, errores = [], []
+    renderer = renderer or get_renderer()
+    for (k, titulo), png in zip(titulos, renderer.render(charts, progress)):
+        if isinstance(png, Exception):
+            errores.append((k, png))
+        else:
+            bar_chart_images.append({"png": png, "title": titulo})
+    return bar_chart_images, errores
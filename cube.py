@@ -0,0 +1,171 @@
+import pandas as pd
+
+from cache import LRUCache, open_disk_cache
+from schema import FORMAT_VERSION, METRIC_COLUMNS
+
+# Valor de los niveles agregados ("todos los partidos", "ambos tiempos", ...)
+TODOS = 'Todos'
+
+KEYS = ['Partido + Fecha', 'Period Number', 'Player Name']
+STATS = ['sum', 'mean', 'max', 'count']
+
+MAX_CELDAS_CACHE = 512
+MAX_TABLAS_CACHE = 32
+
+# Compartidas entre sesiones: celdas por hash de archivo y tablas por conjunto de archivos
+_cells = LRUCache(MAX_CELDAS_CACHE, disk=open_disk_cache("celdas", FORMAT_VERSION))
+_tables = LRUCache(MAX_TABLAS_CACHE)
+
+
+def cell_cache():
+    """Caché de celdas por archivo (en disco con GPS_CACHE_DIR)."""
+    return _cells
+
+
+def table_cache():
+    """Caché de tablas agregadas por clave del cubo."""
+    return _tables
+
+
+def file_cells(df):
+    """Celdas base (partido, tiempo, jugador) x métrica de un archivo: sum, count y max."""
+    columnas = [c for c in METRIC_COLUMNS if c in df.columns]
+    df = df[df['Player Name'].notna()]
+    grupos = df.groupby(KEYS, observed=True, dropna=False, sort=False)[columnas]
+    return {
+        'sum': grupos.sum(),
+        'count': grupos.count(),
+        'max': grupos.max(),
+    }
+
+
+class AggregateCube:
+    """Cubo de agregados por (partido, tiempo, jugador) x métrica.
+
+    Las celdas base se calculan una vez por archivo al ingresar; los totales
+    para "Todos" en partido y/o tiempo se precalculan sobre las celdas (no
+    sobre las filas), así cada combinación de filtros es una búsqueda en un dict.
+    """
+
+    def __init__(self):
+        self._partes = {}
+        self._fechas = {}
+        self._tabla = None
+
+    def __contains__(self, clave):
+        return clave in self._partes
+
+    def __len__(self):
+        return len(self._partes)
+
+    def update(self, frames):
+        """Sincroniza con `frames` (clave -> DataFrame o None si ya estaba incluido)."""
+        for clave in set(self._partes).difference(frames):
+            del self._partes[clave]
+            self._tabla = None
+        for clave, df in frames.items():
+            if clave not in self._partes and df is not None:
+                self._partes[clave] = _cells.get_or_compute(clave, lambda: file_cells(df))
+                for partido, fecha in df[['Partido + Fecha', 'Fecha CSV']].drop_duplicates().itertuples(index=False):
+                    self._fechas.setdefault(partido, fecha)
+                self._tabla = None
+
+    def _build(self):
+        partes = list(self._partes.values())
+        if not partes:
+            return {}
+        # Un mismo partido puede venir en varios archivos: se combinan sus celdas
+        base = {}
+        for stat, func in (('sum', 'sum'), ('count', 'sum'), ('max', 'max')):
+            todas = pd.concat([p[stat] for p in partes])
+            base[stat] = todas.groupby(level=[0, 1, 2], observed=True, dropna=False).agg(func)
+
+        tabla = {}
+        for niveles in ([0, 1], [0], [1], []):
+            agrupado = {
+                stat: base[stat].groupby(level=niveles + [2], observed=True, dropna=False).agg(func)
+                for stat, func in (('sum', 'sum'), ('count', 'sum'), ('max', 'max'))
+            }
+            agrupado['mean'] = agrupado['sum'] / agrupado['count'].where(agrupado['count'] > 0)
+            combinado = pd.concat(agrupado, axis=1)
+            if not niveles:
+                tabla[(TODOS, TODOS)] = combinado
+                continue
+            # Tras agrupar, los niveles clave son los primeros del índice
+            posiciones = list(range(len(niveles)))
+            for clave, celdas in combinado.groupby(level=posiciones, observed=True, dropna=False):
+                clave = dict(zip(niveles, clave if isinstance(clave, tuple) else (clave,)))
+                periodo = clave.get(1, TODOS)
+                if periodo != TODOS and not pd.isna(periodo):
+                    periodo = int(periodo)
+                tabla[(clave.get(0, TODOS), periodo)] = celdas.droplevel(posiciones)
+        return tabla
+
+    def _table(self):
+        if self._tabla is None:
+            # Las claves son hashes de contenido: el mismo conjunto de archivos da la misma tabla
+            self._tabla = _tables.get_or_compute(self.key(), self._build)
+        return self._tabla
+
+    def lookup(self, partido=TODOS, periodo=TODOS, jugador=TODOS):
+        """Agregados por jugador para la combinación de filtros.
+
+        Devuelve un DataFrame indexado por `Player Name` con columnas
+        (estadística, métrica); vacío si la combinación no tiene datos.
+        """
+        celdas = self._table().get((partido, periodo))
+        if celdas is None:
+            return pd.DataFrame(columns=pd.MultiIndex.from_product([STATS, []]))
+        if jugador != TODOS:
+            celdas = celdas[celdas.index == jugador]
+        return celdas
+
+    def by_match(self, periodo=TODOS, stat='mean'):
+        """Una fila por (partido, jugador) con la estadística `stat` de cada métrica.
+
+        Las filas van en orden cronológico de partido, listas para comparar
+        cada partido con los anteriores (ver compare.py).
+        """
+        tabla = self._table()
+        partidos = sorted(
+            (p for p, t in tabla if p != TODOS and t == periodo), key=lambda p: (self._fechas.get(p, ''), str(p))
+        )
+        if not partidos:
+            return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=[KEYS[0], KEYS[2]]))
+        return pd.concat({p: tabla[(p, periodo)][stat] for p in partidos}, names=[KEYS[0]])
+
+    def by_half(self, stat='mean'):
+        """Una fila por (partido, tiempo, jugador) de los tiempos 1 y 2, en una sola tabla.
+
+        Incluye el partido `TODOS` (toda la temporada por tiempo), para que un
+        único pivote sobre el tiempo dé la comparación por partido y de la temporada.
+        """
+        tabla = self._table()
+        # La temporada primero y luego los partidos en orden cronológico, como `by_match`
+        claves = sorted(
+            (k for k in tabla if k[1] in (1, 2)),
+            key=lambda k: (k[0] != TODOS, self._fechas.get(k[0], ''), str(k[0]), k[1])
+        )
+        if not claves:
+            return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=KEYS))
+        return pd.concat({k: tabla[k][stat] for k in claves}, names=KEYS[:2])
+
+    def key(self):
+        """Clave de contenido del cubo (conjunto de hashes de archivo), para memoizar derivados."""
+        return frozenset(self._partes)
+
+    def matches(self):
+        return sorted(str(p) for p in self._partidos_cargados())
+
+    def players(self):
+        return sorted(str(j) for j in self._table().get((TODOS, TODOS), pd.DataFrame()).index)
+
+    def date(self, partido=TODOS):
+        """Fecha del partido; con "Todos", la del primer partido cronológico."""
+        if partido != TODOS:
+            return self._fechas.get(partido, 'Sin Fecha')
+        fechas = sorted(self._fechas[p] for p in self._partidos_cargados())
+        return fechas[0] if fechas else 'Sin Fecha'
+
+    def _partidos_cargados(self):
+        return {k[0] for k in self._table() if k[0] != TODOS}
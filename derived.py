@@ -0,0 +1,125 @@
+"""Métricas derivadas, declaradas como expresiones sobre columnas del export.
+
+Cada métrica es una expresión de `DataFrame.eval`: las columnas del CSV van
+entre comillas invertidas y las demás derivadas se nombran por su id, así que
+una derivada puede construirse sobre otra (`hsr_sprint_90` usa `hsr_sprint` y
+`minutes`). La evaluación es perezosa y por columnas completas:
+
+- solo se calculan las métricas pedidas (y las derivadas de las que dependen);
+- cada una se memoriza por (contenido del DataFrame, id), así que un rerun con
+  los mismos filtros no evalúa nada;
+- si falta alguna columna de origen, la métrica simplemente no aparece.
+
+Las expresiones valen igual sobre sumas que sobre medias por jugador: las
+normalizaciones son cocientes y los totales son lineales. La caída de un
+tiempo al otro no es una expresión por fila (compara dos filas del mismo
+jugador): la calcula fatigue.py pivotando las métricas, derivadas incluidas.
+
+Cada vista pide sus ids (el grupo o la métrica que muestra, las métricas del
+informe) y solo esas se evalúan; `ids=None` significa todas.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from charts import data_digest
+
+# id -> expresión; el orden es el de pantalla
+DERIVED_METRICS = {
+    "minutes": "`Player Load Work Time` + `Player Load Rest Time`",
+    "distance_min": "`Work Rate Total Dist` / minutes",
+    "distance_90": "distance_min * 90",
+    "hsr_sprint": "`HSR Eff Distance (Gen2)` + `Sprint Eff Distance (Gen2)`",
+    "hsr_sprint_90": "hsr_sprint / minutes * 90",
+    "hi_ratio": "hsr_sprint / `Work Rate Total Dist` * 100",
+    "load_min": "`Player Load` / minutes",
+    "acc_dec_90": "(`Acc Eff Count (Gen2)` + `Dec Eff Count (Gen2)`) / minutes * 90",
+}
+
+# Estadísticas del cubo a las que se añaden las derivadas (max y count no se combinan así)
+DERIVED_STATS = ['sum', 'mean']
+
+MAX_DERIVADAS_CACHE = 1024
+
+_COLUMNA = re.compile(r'`([^`]+)`')
+_NOMBRE = re.compile(r'\b[A-Za-z_]\w*\b')
+
+_cache = LRUCache(MAX_DERIVADAS_CACHE)
+
+
+def derived_cache():
+    """Caché de métricas derivadas ya evaluadas."""
+    return _cache
+
+
+@lru_cache(maxsize=None)
+def dependencies(metric_id):
+    """(columnas del CSV, derivadas) que usa la expresión de `metric_id`."""
+    expresion = DERIVED_METRICS[metric_id]
+    columnas = tuple(_COLUMNA.findall(expresion))
+    derivadas = tuple(n for n in _NOMBRE.findall(_COLUMNA.sub(' ', expresion)) if n in DERIVED_METRICS)
+    return columnas, derivadas
+
+
+def available(metric_id, columnas):
+    """Si la derivada `metric_id` se puede calcular con las columnas del CSV `columnas`."""
+    if metric_id not in DERIVED_METRICS:
+        return False
+    origen, derivadas = dependencies(metric_id)
+    return all(c in columnas for c in origen) and all(available(d, columnas) for d in derivadas)
+
+
+def derived_ids(ids=None):
+    """Los ids derivados de `ids` (métricas de cualquier tipo; None = todas) en orden de declaración."""
+    return tuple(DERIVED_METRICS) if ids is None else tuple(i for i in DERIVED_METRICS if i in set(ids))
+
+
+def _evaluate(frame, metric_id, digest):
+    clave = (digest, metric_id)
+    serie = _cache.get(clave)
+    if serie is not None:
+        return serie
+    columnas, derivadas = dependencies(metric_id)
+    if any(c not in frame.columns for c in columnas):
+        return None
+    entorno = {}
+    for d in derivadas:
+        entorno[d] = _evaluate(frame, d, digest)
+        if entorno[d] is None:
+            return None
+    with np.errstate(divide='ignore', invalid='ignore'):
+        serie = frame.eval(DERIVED_METRICS[metric_id], resolvers=(entorno,))
+    # Sin minutos (o sin distancia) el cociente no está definido
+    serie = serie.astype(np.float64).replace([np.inf, -np.inf], np.nan).rename(metric_id)
+    _cache.put(clave, serie)
+    return serie
+
+
+def evaluate(frame, ids=None):
+    """Derivadas de `ids` (todas por defecto; los ids no derivados se ignoran) de `frame`, con el mismo índice.
+
+    Devuelve un DataFrame con una columna por id calculable.
+    """
+    ids = derived_ids(ids)
+    digest = data_digest(frame) if ids else None
+    series = [s for s in (_evaluate(frame, i, digest) for i in ids) if s is not None]
+    return pd.concat(series, axis=1) if series else pd.DataFrame(index=frame.index)
+
+
+def with_derived(agregados, ids=None):
+    """Resultado de `AggregateCube.lookup` con las derivadas añadidas a `DERIVED_STATS`."""
+    ids = derived_ids(ids)
+    if agregados.empty or not ids:
+        return agregados
+
+    def combinar():
+        nuevas = {stat: evaluate(agregados[stat], ids) for stat in DERIVED_STATS}
+        if all(d.empty for d in nuevas.values()):
+            return agregados
+        combinado = pd.concat([agregados, pd.concat(nuevas, axis=1)], axis=1)
+        return combinado.sort_index(axis=1, level=0, sort_remaining=False)
+    # También se memoriza el resultado combinado: en un rerun sin cambios no hay concat
+    return _cache.get_or_compute((data_digest(agregados), ids), combinar)
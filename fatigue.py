@@ -0,0 +1,92 @@
+"""Perfil de fatiga: primer tiempo frente a segundo tiempo.
+
+Parte de `AggregateCube.by_half` (una fila por partido, tiempo y jugador, con
+la temporada completa como partido `TODOS`) y hace un único pivote sobre el
+tiempo: la diferencia absoluta y porcentual de cada métrica, jugador y partido
+sale de restar dos bloques de columnas, sin filtrar ni reagrupar por jugador.
+Las métricas derivadas pedidas (ver derived.py) se evalúan por tiempo antes
+del pivote y se añaden a la tabla de las columnas del CSV.
+"""
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from cube import TODOS
+from derived import derived_ids, evaluate
+
+FIELDS = ['primero', 'segundo', 'cambio', 'cambio_pct']
+
+MAX_PERFILES_CACHE = 16
+
+_cache = LRUCache(MAX_PERFILES_CACHE)
+
+
+def profile_cache():
+    """Caché de perfiles por tiempo, por clave del cubo (y métricas derivadas)."""
+    return _cache
+
+
+def half_profile(valores):
+    """Pivote de `valores` (índice (partido, tiempo, jugador), columnas métricas) sobre el tiempo.
+
+    Devuelve un DataFrame indexado por (partido, jugador) con columnas (métrica, campo).
+    """
+    valores = pd.DataFrame(valores.to_numpy(np.float64), index=valores.index, columns=valores.columns)
+    # unstack ordena las filas: se recupera el orden de entrada (temporada y luego cronológico)
+    pivote = valores.unstack(level=1).reindex(valores.index.droplevel(1).unique())
+    columnas = pd.MultiIndex.from_product([valores.columns, FIELDS])
+    if pivote.empty or not {1, 2} <= set(pivote.columns.get_level_values(1)):
+        return pd.DataFrame(index=pivote.index, columns=columnas, dtype=np.float64)
+    primero = pivote.xs(1, axis=1, level=1)
+    segundo = pivote.xs(2, axis=1, level=1)
+    cambio = segundo - primero
+    tabla = pd.concat({
+        'primero': primero,
+        'segundo': segundo,
+        'cambio': cambio,
+        'cambio_pct': cambio / primero.where(primero != 0) * 100,
+    }, axis=1)
+    return tabla.swaplevel(axis=1)[columnas]
+
+
+def half_table(cube, ids=None):
+    """`half_profile` de todos los partidos del cubo, memorizado por contenido del cubo.
+
+    Incluye las derivadas de `ids` (None = todas).
+    """
+    clave = cube.key()
+    base = _cache.get_or_compute(clave, lambda: half_profile(cube.by_half()))
+    ids = derived_ids(ids)
+    if not ids:
+        return base
+
+    def combinar():
+        derivadas = half_profile(evaluate(cube.by_half(), ids))
+        return pd.concat([base, derivadas], axis=1)
+    return _cache.get_or_compute((clave, ids), combinar)
+
+
+def half_summary(tabla, partido=TODOS, jugador=TODOS):
+    """Perfil de un partido (o la temporada) para un jugador o la media de la plantilla.
+
+    Devuelve un DataFrame con una fila por métrica y las columnas de `FIELDS`.
+    """
+    filas = tabla.xs(partido, level=0) if partido in tabla.index.get_level_values(0) else tabla.iloc[:0]
+    if jugador != TODOS:
+        filas = filas[filas.index == jugador]
+    medias = filas.mean().unstack()
+    if medias.empty:
+        return pd.DataFrame(columns=FIELDS, dtype=np.float64)
+    # Con la plantilla, el cambio es el de las medias por tiempo, no la media de los cambios
+    medias['cambio'] = medias['segundo'] - medias['primero']
+    medias['cambio_pct'] = medias['cambio'] / medias['primero'].where(medias['primero'] != 0) * 100
+    return medias[FIELDS]
+
+
+def half_rows(resumen, metrics):
+    """Filas (nombre, primero, segundo, cambio %) para el informe, en el orden de `metrics` (nombre -> columna)."""
+    return [
+        (k, *resumen.loc[c, ['primero', 'segundo', 'cambio_pct']])
+        for k, c in metrics.items()
+        if c in resumen.index and not resumen.loc[c, ['primero', 'segundo']].isna().any()
+    ]
@@ -0,0 +1,330 @@
+import hashlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from cache import LRUCache, open_disk_cache
+from cube import AggregateCube
+from naming import match_label, parse_file_date, parse_period
+from schema import FORMAT_VERSION, METRIC_COLUMNS, apply_schema, concat_frames, read_dtypes
+
+# Número máximo de archivos procesados que se mantienen en memoria
+MAX_ARCHIVOS_CACHE = 128
+
+# A partir de este tamaño el CSV se lee por bloques de filas
+STREAM_BYTES = 32 * 2 ** 20
+CHUNK_ROWS = 50_000
+
+# Workers para parsear varios archivos a la vez: procesos en la CLI y los benchmarks (el
+# post-proceso de pandas no suelta el GIL), hilos en la app (ver `set_parse_pool`);
+# con GPS_PARSE_WORKERS=1 se parsea en el proceso actual
+PARSE_WORKERS = int(os.environ.get("GPS_PARSE_WORKERS", min(8, os.cpu_count() or 1)))
+# Con menos archivos nuevos no compensa enviar los bytes a otro proceso
+PARALLEL_MIN_FILES = 8
+
+# Motor de `read_csv`: "c", "pyarrow" (multihilo) o "auto" (pyarrow desde ARROW_BYTES si está instalado)
+CSV_ENGINE = os.environ.get("GPS_CSV_ENGINE", "auto")
+ARROW_BYTES = 2 ** 20
+_HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Columnas no métricas que se conservan del export
+KEY_COLUMNS = ['Player Name', 'Period Name', 'Period Number', 'Date']
+
+# Formato de la columna `Date` de los exports (DD/MM/AAAA)
+DATE_FORMAT = '%d/%m/%Y'
+
+
+def file_digest(data):
+    """Hash del contenido del archivo, usado como clave de caché."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def csv_engine(tamano, engine=CSV_ENGINE):
+    """Motor de lectura para un archivo de `tamano` bytes.
+
+    En archivos pequeños el coste fijo de Arrow supera al del parser C.
+    """
+    if engine == "auto":
+        engine = "pyarrow" if tamano >= ARROW_BYTES and _HAS_PYARROW else "c"
+    return engine
+
+
+def period_keys(period_name, fecha):
+    """Columnas clave derivadas de `Period Name`: Partido + Fecha, Rival y tiempo.
+
+    `naming.parse_period` se evalúa una vez por categoría, no por fila, así que
+    un export con miles de sesiones se etiqueta sin recorrer las filas.
+    """
+    period_name = period_name.astype('category')
+    info = {c: parse_period(c) for c in period_name.cat.categories}
+    partido = period_name.map({c: i.partido for c, i in info.items()}).astype(object)
+    rival = period_name.map({c: i.rival for c, i in info.items()}).astype('category')
+    tiempo = period_name.map({c: i.tiempo for c, i in info.items()}).astype(object)
+    return match_label(partido, fecha), rival, pd.to_numeric(tiempo, errors='coerce')
+
+
+def export_dates(fechas):
+    """Columna `Date` del export como texto AAAA-MM-DD (NaN si no se entiende).
+
+    Se convierte una vez por fecha distinta, no por fila: con `DATE_FORMAT`, luego
+    ISO 8601 y solo el resto elemento a elemento (`format='mixed'`, día primero).
+    """
+    fechas = fechas.astype('category')
+    valores = fechas.cat.categories
+    convertidas = pd.Series(pd.to_datetime(valores, format=DATE_FORMAT, errors='coerce'), index=valores)
+    for formato in ('ISO8601', 'mixed'):
+        otras = convertidas.isna()
+        if not otras.any():
+            break
+        convertidas[otras] = pd.to_datetime(valores[otras], format=formato, dayfirst=True, errors='coerce')
+    return fechas.map(convertidas.dt.strftime('%Y-%m-%d')).astype(object)
+
+
+def _add_context(df, nombre, clave):
+    df.columns = df.columns.str.strip()
+    fecha = parse_file_date(nombre)
+    if 'Date' in df.columns:
+        # Exports de varias sesiones: la fecha de cada fila manda sobre la del nombre del archivo
+        df['Fecha CSV'] = export_dates(df['Date']).fillna(fecha)
+        df = df.drop(columns='Date')
+    else:
+        df['Fecha CSV'] = fecha
+    df['Archivo'] = nombre
+    df['Hash CSV'] = clave
+    df['Partido + Fecha'], df['Rival'], tiempo = period_keys(df['Period Name'], df['Fecha CSV'])
+    if 'Period Number' not in df.columns:
+        df['Period Number'] = tiempo
+    return apply_schema(df)
+
+
+def iter_match_chunks(source, nombre, clave, chunksize=None, numeric=True, engine="c"):
+    """Lee un export en bloques de `chunksize` filas, cada uno ya tipado y etiquetado.
+
+    Solo se leen las columnas de métricas y las claves; el resto del export
+    (a menudo cientos de columnas) no llega a cargarse. Cada bloque trae su
+    propio `Partido + Fecha` por fila, así que los exports con varios partidos
+    se separan sobre la marcha. `engine` solo se usa al leer el archivo entero
+    (Arrow no lee por bloques).
+    """
+    source.seek(0)
+    encabezado = pd.read_csv(source, delimiter=';', nrows=0).columns
+    usecols = [c for c in encabezado if c.strip() in METRIC_COLUMNS or c.strip() in KEY_COLUMNS]
+    dtypes = read_dtypes(usecols)
+    if not numeric:
+        dtypes = {c: t for c, t in dtypes.items() if t == 'category'}
+    source.seek(0)
+    if chunksize is None:
+        yield _add_context(pd.read_csv(source, delimiter=';', usecols=usecols, dtype=dtypes, engine=engine), nombre, clave)
+        return
+    lector = pd.read_csv(source, delimiter=';', usecols=usecols, dtype=dtypes, chunksize=chunksize)
+    with lector:
+        for bloque in lector:
+            yield _add_context(bloque, nombre, clave)
+
+
+def parse_match_csv(nombre, data, clave=None, chunksize=None, engine=CSV_ENGINE):
+    """Lee un CSV de partido (delimitado por ';') y añade las columnas de contexto.
+
+    Las métricas se leen directamente como float32 y las claves como categorías;
+    si alguna métrica trae valores no numéricos se convierte con `to_numeric`.
+    Los archivos de más de `STREAM_BYTES` se leen por bloques de `CHUNK_ROWS`
+    filas: el pico de memoria del parser no crece con el tamaño del archivo.
+    El resto se lee de una vez con el motor de `csv_engine(len(data), engine)`.
+    """
+    clave = clave or file_digest(data)
+    if chunksize is None and len(data) > STREAM_BYTES:
+        chunksize = CHUNK_ROWS
+    engine = csv_engine(len(data), engine)
+    try:
+        partes = list(iter_match_chunks(io.BytesIO(data), nombre, clave, chunksize, engine=engine))
+    except (ValueError, TypeError):
+        partes = list(iter_match_chunks(io.BytesIO(data), nombre, clave, chunksize, numeric=False, engine=engine))
+    return partes[0] if len(partes) == 1 else concat_frames(partes)
+
+
+def split_matches(df):
+    """Separa el DataFrame de un archivo por `Partido + Fecha` (dict etiqueta -> filas)."""
+    partidos = df['Partido + Fecha']
+    if partidos.nunique() <= 1:
+        return {str(partidos.iloc[0]) if len(df) else '': df}
+    return {str(p): g.reset_index(drop=True) for p, g in df.groupby('Partido + Fecha', observed=True, sort=False)}
+
+
+class IngestCache(LRUCache):
+    """Caché LRU de archivos ya procesados, indexada por el hash de su contenido."""
+
+    def __init__(self, max_entries=MAX_ARCHIVOS_CACHE, disk=None):
+        super().__init__(max_entries, disk=disk)
+
+    def load(self, nombre, data, clave=None):
+        """Devuelve el DataFrame del archivo, procesándolo solo si no está en caché.
+
+        Si varias sesiones suben el mismo archivo a la vez, solo una lo procesa.
+        """
+        clave = clave or file_digest(data)
+        return self.get_or_compute(clave, lambda: parse_match_csv(nombre, data, clave))
+
+    def load_many(self, archivos, pool=None):
+        """DataFrames de `archivos`, lista de (nombre, bytes, clave), como dict clave -> DataFrame.
+
+        Los que no están en caché se parsean en paralelo en `pool` (por defecto
+        el pool de procesos compartido, si hay al menos `PARALLEL_MIN_FILES`).
+        """
+        resultados = {clave: self.get(clave) for _, _, clave in archivos}
+        faltan = [a for a in archivos if resultados[a[2]] is None]
+        if pool is None and len(faltan) >= PARALLEL_MIN_FILES:
+            pool = parse_pool()
+        if pool is not None and faltan:
+            # En hilos solo se gana con el motor de Arrow, que lee sin el GIL
+            engine = "pyarrow" if isinstance(pool, ThreadPoolExecutor) and _HAS_PYARROW else CSV_ENGINE
+            try:
+                futuros = [(a[2], pool.submit(parse_match_csv, *a, engine=engine)) for a in faltan]
+                for clave, futuro in futuros:
+                    resultados[clave] = futuro.result()
+                    self.put(clave, resultados[clave])
+                return resultados
+            except (BrokenProcessPool, OSError):
+                # Sin procesos disponibles (p. ej. en un sandbox) se parsea aquí mismo
+                _disable_pool(pool)
+        for nombre, data, clave in faltan:
+            if resultados[clave] is None:
+                resultados[clave] = self.load(nombre, data, clave)
+        return resultados
+
+
+class MatchFrame:
+    """`full_df` construido de forma incremental a partir de los archivos subidos.
+
+    Solo se concatenan los archivos nuevos y se descartan las filas de los que
+    ya no están; el resto del DataFrame se reutiliza entre ejecuciones. El cubo
+    de agregados (`cube`) se mantiene sincronizado con los mismos archivos.
+    """
+
+    def __init__(self):
+        self.claves = []
+        self.df = None
+        self.cube = AggregateCube()
+
+    def update(self, frames):
+        """Sincroniza con `frames` (dict ordenado clave -> DataFrame) y devuelve `df`.
+
+        Las claves ya presentes pueden venir con valor None: no se vuelven a usar.
+        """
+        actuales = set(self.claves)
+        nuevas = [c for c in frames if c not in actuales]
+        quitadas = actuales.difference(frames)
+
+        if self.df is not None and quitadas:
+            self.df = self.df[~self.df['Hash CSV'].isin(quitadas)].reset_index(drop=True)
+        if nuevas:
+            partes = [frames[c] for c in nuevas]
+            if self.df is not None and not self.df.empty:
+                partes.insert(0, self.df)
+            self.df = concat_frames(partes)
+
+        self.claves = [c for c in self.claves if c not in quitadas] + nuevas
+        self.cube.update(frames)
+        return self.df
+
+    def frames(self, presentes=(), columns=None):
+        """Un DataFrame por archivo cargado, o None para las claves de `presentes`."""
+        columnas = slice(None) if columns is None else [c for c in columns if c in self.df.columns]
+        return OrderedDict(
+            (c, None if c in presentes else self.df.loc[self.df['Hash CSV'] == c, columnas])
+            for c in self.claves
+        )
+
+
+class LocalFile:
+    """Archivo en disco con la misma interfaz que los de `st.file_uploader`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def getvalue(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+_pool = None
+_pool_kind = "process"
+_pool_lock = threading.Lock()
+
+
+def set_parse_pool(kind):
+    """Tipo del pool de `parse_pool`: "process" (por defecto) o "thread".
+
+    La app usa hilos: con "spawn" cada proceso hijo vuelve a importar `__main__`,
+    que bajo Streamlit es el script de la app, y lo ejecutaría entero una vez por worker.
+    """
+    global _pool, _pool_kind
+    with _pool_lock:
+        if kind == _pool_kind:
+            return
+        if _pool:
+            _pool.shutdown(wait=False)
+        _pool, _pool_kind = None, kind
+
+
+def parse_pool():
+    """Pool compartido para parsear (se crea al primer uso), o None con un solo worker.
+
+    Los procesos usan "spawn": hacer fork de un proceso con hilos puede dejar locks tomados.
+    """
+    global _pool
+    if PARSE_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            if _pool_kind == "thread":
+                _pool = ThreadPoolExecutor(PARSE_WORKERS, thread_name_prefix="gps-parse")
+            else:
+                _pool = ProcessPoolExecutor(PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool or None
+
+
+def _disable_pool(pool):
+    # Si el pool compartido no puede arrancar procesos no se vuelve a intentar en cada rerun
+    global _pool
+    with _pool_lock:
+        if pool is _pool:
+            _pool = False
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Caché compartida por el proceso (y en disco con GPS_CACHE_DIR): los mismos bytes no se vuelven a parsear
+_cache = IngestCache(disk=open_disk_cache("ingesta", FORMAT_VERSION))
+
+
+def file_cache():
+    """Caché de archivos parseados compartida por el proceso."""
+    return _cache
+
+
+def ingest_files(uploaded_files, match_frame, cache=None):
+    """Procesa los archivos subidos reutilizando la caché y actualiza `match_frame`."""
+    if cache is None:
+        cache = _cache
+    presentes = set(match_frame.claves)
+    frames = OrderedDict()
+    nuevos = []
+    for file in uploaded_files:
+        data = file.getvalue()
+        clave = file_digest(data)
+        if clave in frames:
+            continue
+        # Los archivos que ya forman parte de `full_df` no se vuelven a leer
+        frames[clave] = None
+        if clave not in presentes:
+            nuevos.append((file.name, data, clave))
+    # Los nuevos se parsean a la vez y se unen a `full_df` en una sola concatenación
+    frames.update(cache.load_many(nuevos))
+    return match_frame.update(frames)
@@ -0,0 +1,151 @@
+"""Cola de informes en segundo plano.
+
+Generar un PDF (sobre todo con los gráficos rasterizados por Kaleido,
+GPS_PDF_CHARTS=png) puede tardar segundos; si se hace dentro del script de
+Streamlit, la página queda bloqueada hasta que termina. Aquí cada informe es
+un `ReportJob` que corre en un pool de hilos compartido por todas las sesiones:
+
+- el id del trabajo es un hash de la petición (tipo, idioma, filtros y datos),
+  así que pedir dos veces el mismo informe, aunque sea desde otra sesión,
+  devuelve el trabajo que ya existe en lugar de empezar otro;
+- el trabajo informa su progreso (gráficos renderizados / total), mide sus
+  etapas (`job.stage`, p. ej. gráficos y maquetación) y guarda los bytes del
+  resultado para la descarga;
+- los trabajos terminados se conservan hasta `MAX_TRABAJOS`; los fallidos se
+  pueden volver a lanzar.
+
+Las funciones de trabajo no deben llamar a Streamlit: corren fuera del script.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Informes simultáneos (cada uno usa además el pool de renderizado de charts.py)
+REPORT_WORKERS = int(os.environ.get("GPS_REPORT_WORKERS", "2"))
+
+# Trabajos terminados que se conservan para su descarga
+MAX_TRABAJOS = 32
+
+PENDIENTE, EN_CURSO, LISTO, ERROR = 'pendiente', 'en curso', 'listo', 'error'
+
+logger = logging.getLogger("gps.jobs")
+
+
+def job_id(*partes):
+    """Id estable de una petición a partir de sus partes (textos, números, hashes de datos)."""
+    return hashlib.blake2b(repr(partes).encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ReportJob:
+    """Estado de un informe: progreso, resultado (bytes) o error."""
+
+    def __init__(self, id, nombre, archivo, mime):
+        self.id = id
+        self.nombre = nombre
+        self.archivo = archivo
+        self.mime = mime
+        self.estado = PENDIENTE
+        self.hechos = 0
+        self.total = 0
+        self.resultado = None
+        self.avisos = []
+        self.error = None
+        self.creado = time.time()
+        self.segundos = None
+        self.etapas = OrderedDict()
+        self._listo = threading.Event()
+
+    @property
+    def terminado(self):
+        return self.estado in (LISTO, ERROR)
+
+    @property
+    def fraccion(self):
+        return self.hechos / self.total if self.total else 0.0
+
+    def progress(self, hechos, total):
+        self.hechos, self.total = hechos, total
+
+    @contextmanager
+    def stage(self, nombre):
+        """Mide una etapa del trabajo (se acumula por nombre en `etapas`, en segundos)."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + time.perf_counter() - t
+
+    def wait(self, timeout=None):
+        return self._listo.wait(timeout)
+
+    def _run(self, funcion):
+        self.estado = EN_CURSO
+        inicio = time.perf_counter()
+        try:
+            self.resultado, self.avisos = funcion(self)
+            self.estado = LISTO
+        except Exception as e:
+            logger.exception("Falló el informe %s", self.id)
+            self.error = e
+            self.estado = ERROR
+        finally:
+            self.segundos = time.perf_counter() - inicio
+            self._listo.set()
+
+
+class JobQueue:
+    """Pool de hilos con los trabajos indexados por id (sin duplicados)."""
+
+    def __init__(self, workers=REPORT_WORKERS, max_jobs=MAX_TRABAJOS):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def get(self, id):
+        with self._lock:
+            return self._jobs.get(id)
+
+    def submit(self, id, funcion, nombre, archivo, mime):
+        """Encola `funcion(job) -> (bytes, avisos)` bajo `id`, o devuelve el trabajo que ya lo tiene.
+
+        `funcion` puede informar el progreso con `job.progress(hechos, total)`.
+        """
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is not None and job.estado != ERROR:
+                self._jobs.move_to_end(id)
+                return job
+            job = self._jobs[id] = ReportJob(id, nombre, archivo, mime)
+            self._evict()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="gps-report")
+        self._pool.submit(job._run, funcion)
+        return job
+
+    def _evict(self):
+        # Solo se descartan trabajos terminados; los activos siguen aunque se supere el tope
+        for id in [i for i, j in self._jobs.items() if j.terminado][:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Cola compartida por el proceso (el pool se crea al primer trabajo)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,92 @@
+"""Normalización de nombres de partido, tiempo y fecha.
+
+Los patrones se compilan una vez y los resultados se memorizan por texto: cada
+`Period Name` distinto y cada nombre de archivo se analizan una sola vez por
+proceso, no una vez por fila ni por rerun. Convenciones reconocidas:
+
+- tiempo: "RIVAL - 1ER TIEMPO", "RIVAL PRIMER TIEMPO", "RIVAL 2T",
+  "RIVAL - 1st Half", "RIVAL Second Half", "RIVAL H2", con un sufijo opcional
+  entre paréntesis o corchetes o tras un separador, que se conserva en el
+  partido ("RIVAL - 1ER TIEMPO (LOCAL)" -> "RIVAL (LOCAL)");
+- rival: lo que queda tras quitar el tiempo, sin un prefijo "Equipo vs";
+- fecha del archivo: AAAA_MM_DD, AAAA-MM-DD, AAAAMMDD o DD-MM-AAAA en
+  cualquier parte del nombre.
+"""
+import datetime
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+SIN_FECHA = 'Sin Fecha'
+
+_HALF = re.compile(
+    r"""[\s\-_|.]*(?<![^\W_])(?:
+        (?P<numero>1(?:ER|ST)?|2(?:DO|ND)?|PRIMER|SEGUNDO|FIRST|SECOND)[\s_\-]*(?:TIEMPO|HALF|T)
+        |H(?P<corto>[12])
+        |TIEMPO|HALF
+    )(?![^\W_])
+    (?P<sufijo>\s*(?:[(\[].*|[\-_|].*))?\s*$""",
+    re.IGNORECASE | re.VERBOSE,
+)
+_VERSUS = re.compile(r'^.*?\s+(?:vs\.?|v\.?|contra)\s+', re.IGNORECASE)
+
+_SEGUNDO = {'2', '2DO', '2ND', 'SEGUNDO', 'SECOND'}
+
+_FECHAS = [
+    (re.compile(r'(?<!\d)(\d{4})[_\-.](\d{1,2})[_\-.](\d{1,2})(?!\d)'), ('y', 'm', 'd')),
+    (re.compile(r'(?<!\d)(\d{1,2})[_\-.](\d{1,2})[_\-.](\d{4})(?!\d)'), ('d', 'm', 'y')),
+    (re.compile(r'(?<!\d)(\d{4})(\d{2})(\d{2})(?!\d)'), ('y', 'm', 'd')),
+]
+
+PeriodInfo = namedtuple('PeriodInfo', ['partido', 'rival', 'tiempo'])
+
+
+@lru_cache(maxsize=4096)
+def parse_period(period_name):
+    """Partido (sin el tiempo), rival y número de tiempo (1, 2 o None) de un `Period Name`."""
+    texto = str(period_name).strip()
+    m = _HALF.search(texto)
+    tiempo = None
+    if m:
+        numero = (m.group('numero') or m.group('corto') or '').upper()
+        if numero:
+            tiempo = 2 if numero in _SEGUNDO else 1
+        texto = f"{texto[:m.start()]} {(m.group('sufijo') or '').strip()}".strip()
+    return PeriodInfo(texto, _VERSUS.sub('', texto).strip() or texto, tiempo)
+
+
+@lru_cache(maxsize=4096)
+def parse_file_date(nombre):
+    """Fecha AAAA-MM-DD contenida en el nombre de un archivo, o `SIN_FECHA`."""
+    for patron, orden in _FECHAS:
+        for m in patron.finditer(nombre):
+            partes = dict(zip(orden, map(int, m.groups())))
+            try:
+                return datetime.date(partes['y'], partes['m'], partes['d']).isoformat()
+            except ValueError:
+                continue
+    return SIN_FECHA
+
+
+def match_label(partido, fecha):
+    """Etiqueta `Partido + Fecha` usada como clave de partido (textos o Series)."""
+    return partido + ' | ' + fecha
+
+
+def safe_filename(texto, defecto='sin_nombre'):
+    """`texto` apto como nombre de archivo o carpeta; `defecto` si no queda nada."""
+    return re.sub(r'[^\w\-]+', '_', str(texto)).strip('_') or defecto
+
+
+def unique_filename(texto, usados, defecto='sin_nombre'):
+    """`safe_filename(texto)` con `_2`, `_3`... si ya está en `usados` (sin distinguir mayúsculas).
+
+    El nombre devuelto se añade a `usados`: "José P." y "José P" no acaban en el mismo archivo.
+    """
+    base = nombre = safe_filename(texto, defecto)
+    n = 1
+    while nombre.lower() in usados:
+        n += 1
+        nombre = f"{base}_{n}"
+    usados.add(nombre.lower())
+    return nombre
@@ -0,0 +1,196 @@
+"""Demandas máximas (worst case scenario) a partir de trazas crudas de 10 Hz.
+
+Cada archivo de trazas tiene una fila por muestra con, al menos, `Player Name`
+y `Velocity` (m/s); opcionalmente `Acceleration` (m/s²), `Period Name` y
+`Period Number`. Las ventanas móviles se calculan con sumas acumuladas de NumPy
+sobre todos los jugadores a la vez, sin recorrer filas en Python.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from ingest import file_digest, period_keys
+from naming import match_label, parse_file_date
+from schema import concat_frames
+
+SAMPLE_RATE = 10  # Hz
+PEAK_WINDOWS = [1, 3, 5, 10]  # minutos
+
+# Umbrales coherentes con las definiciones de métricas de la app
+HSR_SPEED = 20 / 3.6  # m/s
+SPRINT_SPEED = 25 / 3.6  # m/s
+ACC_THRESHOLD = 1.5  # m/s²
+
+PEAK_METRICS = ['distance', 'hsr', 'sprint', 'acc_dec']
+
+TRACE_DTYPES = {
+    'Player Name': 'category',
+    'Period Name': 'category',
+    'Velocity': np.float32,
+    'Acceleration': np.float32,
+}
+
+MAX_TRAZAS_CACHE = 64
+MAX_PICOS_CACHE = 16
+
+
+def read_trace_csv(nombre, data, clave=None):
+    """Lee un CSV de trazas (delimitado por ';') con las mismas claves que los resúmenes."""
+    encabezado = pd.read_csv(io.BytesIO(data), delimiter=';', nrows=0).columns
+    usecols = [c for c in encabezado if c.strip() in TRACE_DTYPES or c.strip() == 'Period Number']
+    dtypes = {c: TRACE_DTYPES[c.strip()] for c in usecols if c.strip() in TRACE_DTYPES}
+    df = pd.read_csv(io.BytesIO(data), delimiter=';', usecols=usecols, dtype=dtypes)
+    df.columns = df.columns.str.strip()
+    fecha = parse_file_date(nombre)
+    if 'Period Name' in df.columns:
+        df['Partido + Fecha'], _, tiempo = period_keys(df['Period Name'], fecha)
+        df['Partido + Fecha'] = df['Partido + Fecha'].astype('category')
+    else:
+        df['Partido + Fecha'] = pd.Categorical([match_label(nombre.rsplit('.', 1)[0], fecha)] * len(df))
+        tiempo = 1
+    if 'Period Number' not in df.columns:
+        df['Period Number'] = tiempo
+    df['Period Number'] = pd.to_numeric(df['Period Number'], errors='coerce').fillna(0).astype(np.int8)
+    df['Hash CSV'] = clave or file_digest(data)
+    return df.drop(columns=['Period Name'], errors='ignore')
+
+
+_cache = LRUCache(MAX_TRAZAS_CACHE)
+_peaks_cache = LRUCache(MAX_PICOS_CACHE)
+
+
+def trace_cache():
+    """Caché de trazas leídas, por hash de contenido."""
+    return _cache
+
+
+def peaks_cache():
+    """Caché de tablas de picos, por conjunto de hashes."""
+    return _peaks_cache
+
+
+def load_traces(files, cache=None):
+    """Trazas de los archivos subidos, leídas una sola vez por hash de contenido."""
+    if cache is None:
+        cache = _cache
+    partes = []
+    for file in files:
+        data = file.getvalue()
+        clave = file_digest(data)
+        df = cache.get(clave)
+        if df is None:
+            df = read_trace_csv(file.name, data, clave)
+            cache.put(clave, df)
+        partes.append(df)
+    return partes
+
+
+def rolling_peaks(valores, inicios, ventana):
+    """Máximo de la suma móvil de `ventana` muestras dentro de cada segmento.
+
+    `valores` es un array (n, k) y `inicios` los índices (ordenados, el primero
+    0) donde empieza cada segmento. Las ventanas que cruzan el final de un
+    segmento se descartan; los segmentos más cortos que la ventana dan NaN.
+    """
+    n, k = valores.shape
+    fines = np.append(inicios[1:], n)
+    largos = fines - inicios
+    picos = np.full((len(inicios), k), np.nan)
+    if n < ventana or not len(inicios):
+        return picos
+
+    acumulado = np.zeros((n + 1, k))
+    np.cumsum(valores, axis=0, out=acumulado[1:])
+    sumas = acumulado[ventana:] - acumulado[:-ventana]
+
+    segmento = np.repeat(np.arange(len(inicios)), largos)
+    validas = segmento[:n - ventana + 1] == segmento[ventana - 1:]
+    sumas[~validas] = -np.inf
+
+    maximos = np.maximum.reduceat(sumas, np.minimum(inicios, len(sumas) - 1), axis=0)
+    completos = largos >= ventana
+    picos[completos] = maximos[completos]
+    return picos
+
+
+def sample_channels(velocidad, aceleracion, nuevo_segmento, hz=SAMPLE_RATE):
+    """Canales por muestra que se suman en las ventanas: distancia, HSR, sprint y acc/dec.
+
+    Acc/dec cuenta esfuerzos: muestras donde |a| supera el umbral y la
+    anterior (del mismo segmento) no lo hacía.
+    """
+    distancia = velocidad / hz
+    hsr = np.where((velocidad >= HSR_SPEED) & (velocidad < SPRINT_SPEED), distancia, 0.0)
+    sprint = np.where(velocidad >= SPRINT_SPEED, distancia, 0.0)
+    intenso = np.abs(aceleracion) > ACC_THRESHOLD
+    previo = np.concatenate(([False], intenso[:-1])) & ~nuevo_segmento
+    esfuerzos = (intenso & ~previo).astype(np.float64)
+    return np.column_stack([distancia, hsr, sprint, esfuerzos])
+
+
+def empty_peaks():
+    """Tabla de picos sin filas, con el mismo índice y columnas que `peak_demands`."""
+    indice = pd.MultiIndex.from_arrays([[], [], []], names=['Partido + Fecha', 'Player Name', 'Ventana'])
+    return pd.DataFrame(columns=pd.Index(PEAK_METRICS), index=indice)
+
+
+def segment_peaks(velocidad, aceleracion, nuevo_segmento, segmentos, ventanas=PEAK_WINDOWS, hz=SAMPLE_RATE):
+    """Picos de demanda de muestras ya agrupadas en segmentos contiguos.
+
+    `nuevo_segmento` marca la primera muestra de cada segmento y `segmentos`
+    tiene una fila por segmento (en el mismo orden) con `Partido + Fecha`,
+    `Period Number` y `Player Name`. Sin aceleración, se deriva de la velocidad.
+    Acepta arrays de solo lectura (memmaps): no se modifican.
+    """
+    inicios = np.flatnonzero(nuevo_segmento)
+    if not len(inicios):
+        return empty_peaks()
+    if aceleracion is None:
+        aceleracion = np.diff(velocidad, prepend=velocidad[:1]) * hz
+        aceleracion[nuevo_segmento] = 0.0
+    canales = sample_channels(velocidad, aceleracion, nuevo_segmento, hz)
+
+    segmentos = segmentos.reset_index(drop=True)
+    resultados = []
+    for minutos in ventanas:
+        picos = pd.DataFrame(rolling_peaks(canales, inicios, int(minutos * 60 * hz)), columns=pd.Index(PEAK_METRICS))
+        picos[segmentos.columns] = segmentos
+        picos['Ventana'] = minutos
+        resultados.append(picos)
+    picos = pd.concat(resultados, ignore_index=True)
+    return picos.groupby(['Partido + Fecha', 'Player Name', 'Ventana'], observed=True)[PEAK_METRICS].max()
+
+
+def peak_demands(trazas, ventanas=PEAK_WINDOWS, hz=SAMPLE_RATE):
+    """Picos de demanda por (partido, jugador, ventana en minutos).
+
+    `trazas` es un DataFrame o una lista de DataFrames de `read_trace_csv`,
+    con las muestras en orden temporal dentro de cada jugador y tiempo. Las
+    ventanas no cruzan el descanso: se calculan por tiempo y se toma el máximo.
+    """
+    if isinstance(trazas, list):
+        trazas = concat_frames(trazas) if trazas else pd.DataFrame()
+    if trazas.empty:
+        return empty_peaks()
+
+    claves = ['Partido + Fecha', 'Period Number', 'Player Name']
+    # Orden estable: se conserva el orden temporal de las muestras dentro de cada segmento
+    trazas = trazas.sort_values(claves, kind='stable')
+    codigos = trazas.groupby(claves, observed=True, sort=False).ngroup().to_numpy()
+    nuevo_segmento = np.concatenate(([True], codigos[1:] != codigos[:-1]))
+
+    velocidad = trazas['Velocity'].to_numpy(np.float64, na_value=0.0)
+    aceleracion = None
+    if 'Acceleration' in trazas.columns:
+        aceleracion = trazas['Acceleration'].to_numpy(np.float64, na_value=0.0)
+    segmentos = trazas.loc[nuevo_segmento, claves]
+    return segment_peaks(velocidad, aceleracion, nuevo_segmento, segmentos, ventanas, hz)
+
+
+def peak_table(files):
+    """`peak_demands` de los archivos subidos, memorizado por el conjunto de hashes."""
+    trazas = load_traces(files)
+    clave = tuple(sorted(str(t['Hash CSV'].iloc[0]) for t in trazas if not t.empty))
+    return _peaks_cache.get_or_compute(clave, lambda: peak_demands(trazas))
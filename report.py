@@ -0,0 +1,245 @@
+import io
+import math
+import os
+import tempfile
+import zipfile
+
+from fpdf import FPDF
+
+from naming import unique_filename
+
+
+def clean_text(text):
+    """Convierte el texto a latin-1 seguro, reemplazando caracteres Unicode no válidos."""
+    return str(text).encode('latin-1', errors='replace').decode('latin-1')
+
+
+# Colores de `core.neon_bar_chart` sobre el fondo #0d0d0d (la barra es rojo neón al 70 %)
+COLOR_BARRA = (182, 4, 40)
+COLOR_REJILLA = (60, 60, 60)
+COLOR_TEXTO_EJE = (200, 200, 200)
+
+
+def _nice_ticks(minimo, maximo, n=5):
+    """Marcas del eje "redondas" (1, 2, 2.5 o 5 x 10^k) que cubren [minimo, maximo]."""
+    if maximo <= minimo:
+        maximo = minimo + 1
+    bruto = (maximo - minimo) / n
+    base = 10 ** math.floor(math.log10(bruto))
+    paso = next(m * base for m in (1, 2, 2.5, 5, 10) if m * base >= bruto)
+    inicio = math.floor(minimo / paso) * paso
+    return [inicio + i * paso for i in range(int(math.ceil((maximo - inicio) / paso - 1e-9)) + 1)]
+
+
+def _tick_text(valor):
+    return f"{valor:,.0f}" if abs(valor) >= 1000 else f"{valor:g}"
+
+
+def draw_bar_chart(pdf, barras, x, y, w, h):
+    """Barras horizontales de `neon_bar_chart` dibujadas con primitivas de FPDF.
+
+    `barras` es una lista de (jugador, valor) en el orden de `core.chart_data`
+    (ascendente: el último va arriba, como en Plotly). Los nombres van a la
+    izquierda, el valor fuera de cada barra y la rejilla con sus marcas abajo;
+    los valores que faltan dejan la fila sin barra.
+    """
+    if not barras:
+        return
+    valores = [v for _, v in barras if v == v]
+    ticks = _nice_ticks(min([0.0] + valores), max([0.0] + valores))
+    minimo, maximo = ticks[0], ticks[-1]
+
+    alto_fila = (h - 8) / len(barras)
+    fuente = max(4.0, min(9.0, alto_fila * 2.2))
+    pdf.set_font("Arial", size=fuente)
+    ancho_nombres = min(w * 0.3, max(pdf.get_string_width(clean_text(n)) for n, _ in barras) + 2)
+    ancho_valores = max(pdf.get_string_width(f"{v:.1f}") for v in valores) + 2 if valores else 0
+    x0, ancho = x + ancho_nombres, w - ancho_nombres - ancho_valores
+    escala = ancho / (maximo - minimo)
+    cero = x0 + (0 - minimo) * escala
+    alto = alto_fila * len(barras)
+
+    # Rejilla vertical y marcas del eje
+    pdf.set_line_width(0.2)
+    pdf.set_draw_color(*COLOR_REJILLA)
+    pdf.set_text_color(*COLOR_TEXTO_EJE)
+    pdf.set_font("Arial", size=7)
+    for t in ticks:
+        xt = x0 + (t - minimo) * escala
+        pdf.line(xt, y, xt, y + alto)
+        pdf.set_xy(xt - 10, y + alto + 1)
+        pdf.cell(20, 4, _tick_text(t), align='C')
+
+    pdf.set_font("Arial", size=fuente)
+    pdf.set_fill_color(*COLOR_BARRA)
+    for i, (nombre, valor) in enumerate(reversed(barras)):
+        fila = y + i * alto_fila
+        pdf.set_text_color(255, 255, 255)
+        pdf.set_xy(x, fila)
+        pdf.cell(ancho_nombres - 1, alto_fila, clean_text(nombre), align='R')
+        if valor != valor:
+            continue
+        # Como en Plotly, la barra ocupa el 80 % de la fila
+        extremo = x0 + (valor - minimo) * escala
+        pdf.rect(min(cero, extremo), fila + alto_fila * 0.1, abs(extremo - cero), alto_fila * 0.8, 'F')
+        pdf.set_xy(max(cero, extremo) + 0.5, fila)
+        pdf.cell(ancho_valores, alto_fila, f"{valor:.1f}")
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_xy(x, y + h)
+
+
+class DarkPDF(FPDF):
+    """FPDF con fondo oscuro en todas las páginas, también en los saltos automáticos."""
+
+    def header(self):
+        self.set_fill_color(13, 13, 13)
+        self.rect(0, 0, self.w, self.h, 'F')
+
+
+class ReportBuilder:
+    """Motor de informes PDF que escribe cada documento en un flujo de bytes.
+
+    Las partes comunes a todos los informes de un lote (gráficos del equipo y
+    página de definiciones) se preparan una sola vez: los PNG se escriben una
+    vez en un directorio temporal y los textos se limpian una vez. Los gráficos
+    con barras en lugar de PNG (ver `core.report_charts`) se dibujan como
+    vectores en cada página.
+    """
+
+    def __init__(self, labels, metric_definitions, bar_charts=None):
+        self.labels = labels
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._definiciones = [clean_text(f"{k}: {v}") for k, v in metric_definitions.items()]
+        # FPDF solo lee imágenes desde archivo
+        self._charts = []
+        for i, chart in enumerate(bar_charts or []):
+            png = chart.get("png")
+            if chart.get("bars"):
+                self._charts.append((clean_text(chart.get("title")), None, chart["bars"]))
+            elif png:
+                path = os.path.join(self._tmp_dir.name, f"chart_{i}.png")
+                with open(path, 'wb') as f:
+                    f.write(png)
+                self._charts.append((clean_text(chart.get("title")), path, None))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._tmp_dir.cleanup()
+
+    @staticmethod
+    def _dark_page(pdf):
+        # El fondo lo pinta `DarkPDF.header`
+        pdf.add_page()
+        pdf.set_text_color(255, 255, 255)
+
+    def _halves_page(self, pdf, halves):
+        """Tabla primer tiempo / segundo tiempo / cambio % (filas de `fatigue.half_rows`)."""
+        labels = self.labels
+        self._dark_page(pdf)
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, clean_text(labels['halves']), ln=True, align='C')
+        pdf.ln(4)
+        anchos = (85, 33, 33, 33)
+        pdf.set_font("Arial", 'B', 10)
+        for texto, ancho in zip(('', labels['first_half'], labels['second_half'], labels['cambio_pct']), anchos):
+            pdf.cell(ancho, 8, clean_text(texto), align='C')
+        pdf.ln()
+        pdf.set_font("Arial", size=9)
+        for nombre, primero, segundo, pct in halves:
+            pdf.cell(anchos[0], 7, clean_text(nombre))
+            pdf.cell(anchos[1], 7, f"{primero:.1f}", align='C')
+            pdf.cell(anchos[2], 7, f"{segundo:.1f}", align='C')
+            # Caída en rojo, subida en verde; sin primer tiempo no hay porcentaje
+            if pct != pct:
+                pdf.cell(anchos[3], 7, "-", align='C', ln=True)
+                continue
+            pdf.set_text_color(*((255, 80, 80) if pct < 0 else (80, 220, 120)))
+            pdf.cell(anchos[3], 7, f"{pct:+.1f}%", align='C', ln=True)
+            pdf.set_text_color(255, 255, 255)
+
+    def write(self, stream, title, summary, avg_data, halves=None):
+        """Construye un informe y escribe sus bytes en `stream`.
+
+        `halves` son las filas (métrica, 1T, 2T, cambio %) de la sección de tiempos, si se pide.
+        """
+        labels = self.labels
+        pdf = DarkPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        self._dark_page(pdf)
+        pdf.set_font("Arial", 'B', 16)
+        pdf.cell(0, 10, clean_text(title), ln=True, align='C')
+        pdf.ln(10)
+
+        pdf.set_font("Arial", size=12)
+        for k, v in summary.items():
+            k_translated = labels.get(k, k)
+            pdf.cell(0, 10, clean_text(f"{k_translated}: {v}"), ln=True, align='C')
+
+        for cat, items in avg_data.items():
+            pdf.ln(10)
+            pdf.set_font("Arial", 'B', 14)
+            pdf.cell(0, 10, clean_text(f"{labels['avg_of']} {cat}"), ln=True, align='C')
+            pdf.set_font("Arial", size=11)
+            for label, val in items:
+                pdf.cell(0, 8, clean_text(f"{label}: {val:.1f}"), ln=True, align='C')
+
+        if halves:
+            self._halves_page(pdf, halves)
+
+        for chart_title, path, barras in self._charts:
+            try:
+                self._dark_page(pdf)
+                pdf.set_font("Arial", 'B', 14)
+                pdf.cell(0, 10, chart_title, ln=True, align='C')
+                if barras:
+                    # Mismo recuadro que el PNG (160 mm, 700x500) salvo con muchos jugadores
+                    pdf.set_auto_page_break(False)
+                    draw_bar_chart(pdf, barras, 25, pdf.get_y() + 2, 160, min(250, max(115, 6 * len(barras))))
+                    pdf.set_auto_page_break(True, margin=15)
+                else:
+                    pdf.image(path, x=25, w=160)
+            except Exception as e:
+                pdf.cell(0, 10, clean_text(f"Chart error: {e}"), ln=True)
+
+        # Página final con definiciones
+        self._dark_page(pdf)
+        pdf.set_font("Arial", 'B', 14)
+        pdf.cell(0, 10, "Metric Definitions", ln=True, align='C')
+        pdf.set_font("Arial", size=10)
+        for linea in self._definiciones:
+            pdf.multi_cell(0, 6, linea)
+
+        stream.write(pdf.output(dest='S').encode('latin-1'))
+
+    def write_zip(self, stream, title, reports):
+        """Escribe un ZIP con un PDF por cada (nombre, resumen, promedios[, tiempos]) de `reports`.
+
+        Cada PDF se vuelca directamente en su entrada del ZIP, así que en memoria
+        solo hay un documento a la vez además del propio ZIP.
+        """
+        usados = set()
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for nombre, summary, avg_data, *halves in reports:
+                with zf.open(f"{unique_filename(nombre, usados, 'informe')}.pdf", 'w') as entrada:
+                    self.write(entrada, title, summary, avg_data, halves[0] if halves else None)
+
+
+def generate_pdf(title, summary, avg_data, labels, metric_definitions, bar_charts=None, halves=None):
+    """Informe PDF completo como bytes."""
+    stream = io.BytesIO()
+    with ReportBuilder(labels, metric_definitions, bar_charts) as builder:
+        builder.write(stream, title, summary, avg_data, halves)
+    return stream.getvalue()
+
+
+def generate_zip(title, reports, labels, metric_definitions, bar_charts=None):
+    """ZIP con un informe PDF por jugador como bytes (ver `ReportBuilder.write_zip`)."""
+    stream = io.BytesIO()
+    with ReportBuilder(labels, metric_definitions, bar_charts) as builder:
+        builder.write_zip(stream, title, reports)
+    return stream.getvalue()
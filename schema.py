@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Columnas de métricas del export (Catapult), tal como aparecen en el CSV
+METRIC_COLUMNS = [
+    'Work Rate Total Dist',
+    'Tempo Distance (Gen2)',
+    'HSR Eff Distance (Gen2)',
+    'Sprint Eff Distance (Gen2)',
+    'Sprint Eff Count (Gen2)',
+    'Max Velocity',
+    'Acc Eff Count (Gen2)',
+    'Dec Eff Count (Gen2)',
+    'Player Load',
+    'Peak Player Load',
+    'Player Load Work Time',
+    'Player Load Rest Time',
+    'Player Load Work:Rest',
+    'Velocity Exertion',
+    'Velocity Exertion Per Min',
+    'Acceleration Load',
+    'Acceleration Density Index',
+    'RHIE Total Bouts',
+]
+
+# Columnas clave: pocas categorías repetidas en miles de filas
+CATEGORICAL_COLUMNS = [
+    'Player Name',
+    'Period Name',
+    'Partido + Fecha',
+    'Rival',
+    'Fecha CSV',
+    'Archivo',
+    'Hash CSV',
+]
+
+METRIC_DTYPE = np.float32
+PERIOD_DTYPE = np.int8
+
+# Versión del formato de los DataFrames parseados y sus celdas agregadas. Forma parte de la
+# carpeta de la caché en disco: súbase al cambiar este esquema, el parseo o las reglas de naming.py
+FORMAT_VERSION = 2
+
+
+def read_dtypes(columnas):
+    """Dtypes explícitos para `pd.read_csv`, según los nombres crudos del encabezado."""
+    dtypes = {}
+    for col in columnas:
+        nombre = col.strip()
+        if nombre in METRIC_COLUMNS:
+            dtypes[col] = METRIC_DTYPE
+        elif nombre in ('Player Name', 'Period Name'):
+            dtypes[col] = 'category'
+    return dtypes
+
+
+def coerce_metrics(df):
+    """Convierte a float32 las métricas que no se pudieron leer con dtype directo."""
+    for col in METRIC_COLUMNS:
+        if col in df.columns and df[col].dtype != METRIC_DTYPE:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(METRIC_DTYPE)
+    return df
+
+
+def apply_schema(df):
+    """Aplica los tipos compactos al DataFrame de un archivo ya leído."""
+    coerce_metrics(df)
+    if 'Period Number' in df.columns:
+        periodo = pd.to_numeric(df['Period Number'], errors='coerce')
+        df['Period Number'] = periodo.astype(PERIOD_DTYPE if periodo.notna().all() else 'Int8')
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def concat_frames(partes):
+    """`pd.concat` que conserva las columnas categóricas.
+
+    Con categorías distintas por archivo, pandas convertiría las claves a
+    object; antes de concatenar se unifican las categorías de cada columna.
+    """
+    for col in CATEGORICAL_COLUMNS:
+        cats = [p[col].dtype for p in partes if col in p.columns]
+        if len(cats) < 2 or not all(isinstance(c, pd.CategoricalDtype) for c in cats):
+            continue
+        union = pd.Index([])
+        for c in cats:
+            union = union.union(c.categories, sort=False)
+        if all(c.categories.equals(union) for c in cats):
+            continue
+        partes = [
+            p.assign(**{col: p[col].cat.set_categories(union)}) if col in p.columns else p
+            for p in partes
+        ]
+    return pd.concat(partes, ignore_index=True)
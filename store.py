@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from ingest import file_cache, file_digest, split_matches
+from naming import safe_filename
+from schema import CATEGORICAL_COLUMNS, METRIC_COLUMNS
+
+# Carpeta del almacén local; desactivado si GPS_STORE_DIR no está definida (o vacía).
+# Todo lo que se guarda queda disponible para cualquier sesión posterior
+STORE_DIR = os.environ.get("GPS_STORE_DIR", "")
+
+# Columnas que necesita el dashboard: solo se leen estas del Parquet
+LOAD_COLUMNS = CATEGORICAL_COLUMNS + ['Period Number'] + METRIC_COLUMNS
+
+# Un JSON por entrada: cada proceso escribe o borra solo sus archivos, sin reescribir un catálogo común
+CATALOG_DIR = "catalogo"
+
+
+class CatalogStore:
+    """Carpeta con un catálogo de entradas (hash -> metadatos), un JSON por entrada.
+
+    Cada entrada tiene al menos `partido` y `fecha`; el catálogo permite listar
+    y elegir archivos sin abrir ninguno. Varios procesos pueden escribir a la
+    vez: cada entrada se escribe con un renombrado atómico y ninguno reescribe
+    las de otro. Las subclases deciden qué se guarda junto a cada entrada.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        # Protege `_catalog`, que nunca se modifica en sitio: cada cambio publica un dict nuevo
+        self._catalog_lock = threading.Lock()
+        self._catalog = None
+        self._mtime = None
+
+    def _catalog_dir(self):
+        return os.path.join(self.root, CATALOG_DIR)
+
+    def catalog(self):
+        """Entradas del catálogo (hash -> metadatos), recargado si otro proceso añadió o quitó alguna.
+
+        El dict devuelto no cambia después: se puede recorrer mientras otro hilo añade o quita entradas.
+        """
+        with self._catalog_lock:
+            return self._load()
+
+    def _load(self):
+        # Con `_catalog_lock` tomado
+        carpeta = self._catalog_dir()
+        try:
+            mtime = os.stat(carpeta).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._catalog is None or mtime != self._mtime:
+            catalogo = {}
+            for nombre in sorted(os.listdir(carpeta)) if mtime is not None else []:
+                if not nombre.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(carpeta, nombre), encoding='utf-8') as f:
+                        catalogo[nombre[:-len('.json')]] = json.load(f)
+                except FileNotFoundError:
+                    # Otro proceso la acaba de quitar
+                    continue
+            self._catalog, self._mtime = catalogo, mtime
+        return self._catalog
+
+    def _save_entry(self, clave, entrada):
+        carpeta = self._catalog_dir()
+        os.makedirs(carpeta, exist_ok=True)
+        path = os.path.join(carpeta, f"{clave}.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        with self._catalog_lock:
+            self._catalog = {**self._load(), clave: entrada}
+
+    def _drop_entry(self, clave):
+        try:
+            os.remove(os.path.join(self._catalog_dir(), f"{clave}.json"))
+        except FileNotFoundError:
+            pass
+        with self._catalog_lock:
+            self._catalog = {c: e for c, e in self._load().items() if c != clave}
+
+    def __len__(self):
+        return len(self.catalog())
+
+    def __contains__(self, clave):
+        return clave in self.catalog()
+
+    def hashes(self, partido=None):
+        """Claves de los archivos de un partido (o de todos), en orden de fecha."""
+        entradas = sorted(self.catalog().items(), key=lambda kv: (kv[1]["fecha"], kv[1]["partido"]))
+        return [c for c, e in entradas if partido is None or e["partido"] == partido]
+
+
+class MatchStore(CatalogStore):
+    """Almacén Parquet de partidos, particionado por fecha y partido.
+
+    Cada archivo subido se guarda una sola vez como
+    `fecha=<fecha>/partido=<partido>/<hash>.parquet` y el catálogo (ver
+    `CatalogStore`) permite elegir particiones sin abrir ningún Parquet.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        super().__init__(root)
+
+    def append(self, df):
+        """Guarda el DataFrame de un archivo; no hace nada si su hash ya está guardado.
+
+        Un export con varios partidos se guarda como una partición por partido,
+        con clave `<hash>.<n>`; cada una se comporta como un archivo aparte.
+        """
+        origen = str(df['Hash CSV'].iloc[0])
+        with self._lock:
+            if origen in self._origins():
+                return False
+            partes = split_matches(df)
+            for n, (partido, parte) in enumerate(partes.items()):
+                clave = origen if len(partes) == 1 else f"{origen}.{n}"
+                if clave != origen:
+                    parte = parte.assign(**{'Hash CSV': pd.Categorical([clave] * len(parte))})
+                fecha = str(parte['Fecha CSV'].iloc[0])
+                rel = os.path.join(f"fecha={safe_filename(fecha)}", f"partido={safe_filename(partido)}", f"{clave}.parquet")
+                path = os.path.join(self.root, rel)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                parte.to_parquet(path, index=False)
+                self._save_entry(clave, {
+                    "archivo": str(parte['Archivo'].iloc[0]),
+                    "origen": origen,
+                    "fecha": fecha,
+                    "partido": partido,
+                    "filas": len(parte),
+                    "columnas": list(parte.columns),
+                    "path": rel,
+                })
+            return True
+
+    def remove(self, partido):
+        """Quita del almacén las particiones de un partido y sus archivos.
+
+        Devuelve los hashes de los archivos de origen afectados. Un export con
+        varios partidos que siga subido no vuelve a guardarse mientras quede
+        alguno de sus partidos en el almacén.
+        """
+        with self._lock:
+            origenes = set()
+            for clave in self.hashes(partido):
+                entrada = self.catalog()[clave]
+                origenes.add(entrada.get("origen", clave))
+                # Primero el catálogo: nadie intenta leer un archivo ya borrado
+                self._drop_entry(clave)
+                self._delete(entrada["path"])
+            return origenes
+
+    def _delete(self, rel):
+        path = os.path.join(self.root, rel)
+        try:
+            os.remove(path)
+            # Las carpetas de fecha y partido se borran si quedan vacías
+            carpeta = os.path.dirname(path)
+            while os.path.abspath(carpeta) != os.path.abspath(self.root) and not os.listdir(carpeta):
+                os.rmdir(carpeta)
+                carpeta = os.path.dirname(carpeta)
+        except OSError:
+            # Ya borrado por otro proceso
+            pass
+
+    def _origins(self):
+        """Hashes de los archivos guardados (un archivo puede ocupar varias particiones)."""
+        return {e.get("origen", c) for c, e in self.catalog().items()}
+
+    def ingest(self, uploaded_files, cache=None, excluir=()):
+        """Añade al almacén los archivos subidos que aún no estén guardados.
+
+        Los hashes de `excluir` (p. ej. partidos quitados en la sesión) no se guardan.
+        """
+        if cache is None:
+            cache = file_cache()
+        guardados = self._origins() | set(excluir)
+        pendientes = OrderedDict()
+        for file in uploaded_files:
+            data = file.getvalue()
+            clave = file_digest(data)
+            if clave not in guardados:
+                pendientes.setdefault(clave, (file.name, data, clave))
+        # Se parsean todos a la vez (ver `IngestCache.load_many`) y se guardan en orden
+        frames = cache.load_many(list(pendientes.values()))
+        return sum(self.append(frames[clave]) for clave in pendientes)
+
+    def matches(self):
+        """Etiquetas `Partido + Fecha` disponibles, sin abrir los Parquet."""
+        return sorted({e["partido"] for e in self.catalog().values()})
+
+    def read(self, clave, columns=LOAD_COLUMNS):
+        """Lee un archivo guardado, proyectando solo las columnas pedidas."""
+        entrada = self.catalog()[clave]
+        if columns is not None:
+            columns = [c for c in columns if c in entrada["columnas"]]
+        return pd.read_parquet(os.path.join(self.root, entrada["path"]), columns=columns)
+
+    def frames(self, presentes=(), partido=None, columns=LOAD_COLUMNS):
+        """Particiones del partido (o todas); None para las claves de `presentes`, sin leerlas."""
+        return OrderedDict(
+            (c, None if c in presentes else self.read(c, columns))
+            for c in self.hashes(partido)
+        )
+
+    def load(self, match_frame, partido=None, columns=LOAD_COLUMNS):
+        """Actualiza `match_frame` con las particiones del partido elegido (o todas)."""
+        return match_frame.update(self.frames(set(match_frame.claves), partido, columns))
+
+
+_stores = {}
+
+
+def open_store(root=STORE_DIR):
+    """Almacén en `root` (uno por proceso), o None si está desactivado."""
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = MatchStore(root)
+    return _stores[root]
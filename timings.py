@@ -0,0 +1,94 @@
+"""Instrumentación del pipeline: tiempos por etapa y contadores por rerun.
+
+Cada rerun de la app crea un `RunTimings`; las etapas se miden con
+`with timings.stage("ingesta"):` (anidables, se acumulan por nombre) y los
+contadores con `timings.count("filas", n)`. Al final del rerun `finish()`
+añade los aciertos y fallos de las cachés durante el rerun y, si
+`GPS_TIMINGS_LOG` apunta a un archivo, escribe una línea JSON por rerun.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Archivo JSON Lines con un registro por rerun; vacío = sin registro
+TIMINGS_LOG = os.environ.get("GPS_TIMINGS_LOG", "")
+
+# Reruns que se conservan en la sesión para el panel de depuración
+MAX_HISTORIAL = 50
+
+logger = logging.getLogger("gps.timings")
+
+
+def cache_stats(caches):
+    """Aciertos, fallos y tamaño de cada caché de `caches` (nombre -> LRUCache o None)."""
+    return {
+        nombre: {"hits": c.hits, "misses": c.misses, "entradas": len(c)}
+        for nombre, c in caches.items() if c is not None
+    }
+
+
+class RunTimings:
+    """Tiempos por etapa y contadores de un rerun."""
+
+    def __init__(self, caches=None):
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.etapas = OrderedDict()
+        self.contadores = OrderedDict()
+        self._caches = caches or {}
+        self._cache_inicial = cache_stats(self._caches)
+        self.resultado = None
+
+    @contextmanager
+    def stage(self, nombre):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(nombre, time.perf_counter() - t)
+
+    def add(self, nombre, segundos):
+        """Suma `segundos` a la etapa `nombre` (p. ej. etapas medidas fuera del script, ver jobs.py)."""
+        self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+    def count(self, nombre, n=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def finish(self):
+        """Cierra el rerun y devuelve su registro (también al log JSON, si está activo)."""
+        if self.resultado is not None:
+            return self.resultado
+        caches = {}
+        for nombre, final in cache_stats(self._caches).items():
+            inicial = self._cache_inicial.get(nombre, {"hits": 0, "misses": 0})
+            caches[nombre] = {
+                "hits": final["hits"] - inicial["hits"],
+                "misses": final["misses"] - inicial["misses"],
+                "entradas": final["entradas"],
+            }
+        self.resultado = {
+            "inicio": self.inicio,
+            "total": time.perf_counter() - self._t0,
+            "etapas": dict(self.etapas),
+            "contadores": dict(self.contadores),
+            "caches": caches,
+        }
+        if TIMINGS_LOG:
+            try:
+                with open(TIMINGS_LOG, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(self.resultado, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning("No se pudo escribir %s: %s", TIMINGS_LOG, e)
+        logger.debug("rerun %.3fs %s", self.resultado["total"], self.resultado["etapas"])
+        return self.resultado
+
+
+def history_frame(historial):
+    """Historial de reruns como tabla: una fila por rerun, una columna por etapa."""
+    filas = [{"total": r["total"], **r["etapas"]} for r in historial]
+    return pd.DataFrame(filas).round(4)
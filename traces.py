@@ -0,0 +1,174 @@
+"""Almacén binario de trazas crudas de 10 Hz, leído con memory-map.
+
+Cada archivo de trazas se guarda una vez, por hash de contenido, como una
+carpeta con un `.npy` de tipo fijo por canal (velocidad, aceleración). Las
+muestras se ordenan por tiempo y jugador, así que cada tiempo de un partido y
+cada (tiempo, jugador) son rangos contiguos; el índice de offsets vive en el
+catálogo JSON. Cortar un tiempo o un jugador devuelve vistas del memmap sin
+leer el resto del archivo.
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from cube import TODOS
+from ingest import file_digest
+from naming import safe_filename
+from peaks import (
+    PEAK_WINDOWS, SAMPLE_RATE, empty_peaks, peaks_cache, read_trace_csv, segment_peaks,
+    trace_cache
+)
+from store import STORE_DIR, CatalogStore
+
+TRACES_DIR = "trazas"
+
+# Canal -> columna de `read_trace_csv`
+CHANNELS = {'velocity': 'Velocity', 'acceleration': 'Acceleration'}
+CHANNEL_DTYPE = np.float32
+
+
+class TraceStore(CatalogStore):
+    """Trazas por partido en archivos `.npy` con memory-map y un índice de offsets.
+
+    El catálogo guarda, por hash, la lista de segmentos
+    `[periodo, jugador, inicio, fin]` en el orden en que están escritas las
+    muestras, de modo que no hace falta abrir ningún array para localizarlas.
+    """
+
+    def __init__(self, root):
+        super().__init__(root)
+        self._arrays = {}
+
+    def append(self, df, archivo=''):
+        """Guarda las trazas de un archivo; no hace nada si su hash ya está guardado."""
+        clave = str(df['Hash CSV'].iloc[0])
+        with self._lock:
+            if clave in self.catalog():
+                return False
+            partido = str(df['Partido + Fecha'].iloc[0])
+            df = df.sort_values(['Period Number', 'Player Name'], kind='stable')
+            codigos = df.groupby(['Period Number', 'Player Name'], observed=True, sort=False).ngroup().to_numpy()
+            inicios = np.flatnonzero(np.concatenate(([True], codigos[1:] != codigos[:-1]))) if len(df) else []
+            fines = np.append(inicios[1:], len(df)) if len(df) else []
+            segmentos = [
+                [int(df['Period Number'].iat[i]), str(df['Player Name'].iat[i]), int(i), int(f)]
+                for i, f in zip(inicios, fines)
+            ]
+
+            rel = os.path.join(f"partido={safe_filename(partido)}", clave)
+            path = os.path.join(self.root, rel)
+            # Se escribe en una carpeta temporal y se renombra: nunca queda un archivo a medias
+            tmp = f"{path}.{os.getpid()}.tmp"
+            os.makedirs(tmp, exist_ok=True)
+            canales = []
+            for canal, columna in CHANNELS.items():
+                if columna in df.columns:
+                    np.save(os.path.join(tmp, f"{canal}.npy"), df[columna].to_numpy(CHANNEL_DTYPE, na_value=0.0))
+                    canales.append(canal)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp, path)
+
+            self._save_entry(clave, {
+                "archivo": archivo,
+                "fecha": partido.rsplit(' | ', 1)[-1],
+                "partido": partido,
+                "muestras": len(df),
+                "canales": canales,
+                "segmentos": segmentos,
+                "path": rel,
+            })
+            return True
+
+    def ingest(self, uploaded_files, cache=None):
+        """Añade al almacén las trazas subidas que aún no estén guardadas."""
+        if cache is None:
+            cache = trace_cache()
+        nuevos = 0
+        for file in uploaded_files:
+            data = file.getvalue()
+            clave = file_digest(data)
+            if clave in self:
+                continue
+            # Las trazas grandes no se quedan en la caché de la sesión: pasan al almacén
+            df = cache.get(clave)
+            if df is None:
+                df = read_trace_csv(file.name, data, clave)
+            nuevos += self.append(df, file.name)
+        return nuevos
+
+    def arrays(self, clave):
+        """Canales del archivo `clave` como memmaps de solo lectura (abiertos una vez)."""
+        if clave not in self._arrays:
+            entrada = self.catalog()[clave]
+            carpeta = os.path.join(self.root, entrada["path"])
+            self._arrays[clave] = {
+                canal: np.load(os.path.join(carpeta, f"{canal}.npy"), mmap_mode='r')
+                for canal in entrada["canales"]
+            }
+        return self._arrays[clave]
+
+    def segments(self, clave):
+        """Índice de offsets de un archivo: Period Number, Player Name, inicio, fin."""
+        return pd.DataFrame(
+            self.catalog()[clave]["segmentos"],
+            columns=['Period Number', 'Player Name', 'inicio', 'fin'],
+        )
+
+    def _range(self, clave, periodo=TODOS, jugador=TODOS):
+        segmentos = self.segments(clave)
+        if periodo != TODOS:
+            segmentos = segmentos[segmentos['Period Number'] == int(periodo)]
+        if jugador != TODOS:
+            segmentos = segmentos[segmentos['Player Name'] == jugador]
+        if segmentos.empty:
+            return 0, 0, segmentos
+        return int(segmentos['inicio'].min()), int(segmentos['fin'].max()), segmentos
+
+    def slice(self, clave, periodo=TODOS, jugador=TODOS):
+        """Canales de un tiempo y/o jugador de un archivo, como vistas del memmap.
+
+        Un tiempo (y un jugador dentro de un tiempo) es un rango contiguo, así
+        que el corte no copia datos. Devuelve (canales, segmentos) con los
+        offsets de los segmentos relativos al corte.
+        """
+        if periodo == TODOS and jugador != TODOS:
+            raise ValueError("Un jugador en ambos tiempos no es contiguo: corte cada tiempo por separado")
+        inicio, fin, segmentos = self._range(clave, periodo, jugador)
+        segmentos = segmentos.assign(inicio=segmentos['inicio'] - inicio, fin=segmentos['fin'] - inicio)
+        canales = {canal: valores[inicio:fin] for canal, valores in self.arrays(clave).items()}
+        return canales, segmentos.reset_index(drop=True)
+
+    def peaks(self, clave, ventanas=PEAK_WINDOWS, hz=SAMPLE_RATE):
+        """Picos de demanda de un archivo guardado, calculados sobre los memmaps."""
+        canales, segmentos = self.slice(clave)
+        partido = self.catalog()[clave]["partido"]
+        nuevo_segmento = np.zeros(len(canales['velocity']), dtype=bool)
+        nuevo_segmento[segmentos['inicio'].to_numpy()] = True
+        return segment_peaks(
+            canales['velocity'], canales.get('acceleration'), nuevo_segmento,
+            segmentos[['Period Number', 'Player Name']].assign(**{'Partido + Fecha': partido}),
+            ventanas, hz,
+        )
+
+    def peak_table(self, partido=None):
+        """Picos de los archivos de un partido (o de todos), memorizados por el conjunto de hashes."""
+        claves = tuple(sorted(self.hashes(partido)))
+
+        def calcular():
+            partes = [self.peaks(c) for c in claves]
+            return pd.concat(partes).groupby(level=[0, 1, 2]).max() if partes else empty_peaks()
+        return peaks_cache().get_or_compute(claves, calcular)
+
+
+_trace_stores = {}
+
+
+def open_trace_store(root=STORE_DIR):
+    """Almacén de trazas dentro de `root` (uno por proceso), o None si está desactivado."""
+    if not root:
+        return None
+    if root not in _trace_stores:
+        _trace_stores[root] = TraceStore(os.path.join(root, TRACES_DIR))
+    return _trace_stores[root]
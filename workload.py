@@ -0,0 +1,196 @@
+"""Relación de carga aguda:crónica (ACWR) por jugador a lo largo de la temporada.
+
+Las cargas de cada archivo se suman por (día, jugador) en un calendario denso
+(días x jugadores x métricas). Sobre ese calendario se mantienen las sumas
+acumuladas (para las medias móviles de 7 y 28 días) y las EWMA aguda y
+crónica. Al llegar un archivo nuevo solo se recalculan los días desde su fecha
+en adelante: un partido al final de la temporada cuesta unos pocos días, no
+todo el histórico.
+"""
+import numpy as np
+import pandas as pd
+
+from cube import TODOS
+from schema import concat_frames
+
+LOAD_METRICS = [
+    'Player Load',
+    'HSR Eff Distance (Gen2)',
+    'Sprint Eff Distance (Gen2)',
+]
+
+# Columnas que hay que leer del almacén para alimentar el motor
+WORKLOAD_COLUMNS = ['Player Name', 'Fecha CSV', 'Hash CSV'] + LOAD_METRICS
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+METHODS = ['ewma', 'rolling']
+FIELDS = ['carga', 'aguda', 'cronica', 'acwr']
+
+
+def daily_loads(df, metrics=LOAD_METRICS):
+    """Carga diaria por (Hash CSV, Fecha, Player Name); descarta filas sin fecha válida."""
+    columnas = [c for c in metrics if c in df.columns]
+    df = df[df['Player Name'].notna()]
+    fechas = pd.to_datetime(df['Fecha CSV'].astype(str), format='%Y-%m-%d', errors='coerce')
+    df = df.assign(Fecha=fechas)[fechas.notna()]
+    diarias = df.groupby(['Hash CSV', 'Fecha', 'Player Name'], observed=True)[columnas].sum()
+    return diarias.reindex(columns=list(metrics), fill_value=0.0).astype(np.float64)
+
+
+class WorkloadEngine:
+    """ACWR móvil (7/28 días) y EWMA por jugador, actualizado por archivo.
+
+    Sigue el mismo protocolo que `AggregateCube.update`: recibe un dict
+    clave -> DataFrame (o None si ya estaba incluido) y quita las claves que
+    faltan. Las consultas recalculan, como mucho, desde el día más antiguo
+    que haya cambiado.
+    """
+
+    def __init__(self, metrics=LOAD_METRICS, acute=ACUTE_DAYS, chronic=CHRONIC_DAYS):
+        self.metrics = list(metrics)
+        self.acute = acute
+        self.chronic = chronic
+        # Suavizado de Williams et al. (2017): lambda = 2 / (N + 1)
+        self.lambdas = np.array([2 / (acute + 1), 2 / (chronic + 1)])
+        self._partes = {}
+        self._jugadores = {}
+        self._inicio = None
+        self._fin = -1
+        self._carga = np.zeros((0, 0, len(self.metrics)))
+        self._acumulado = np.zeros((1, 0, len(self.metrics)))
+        self._ewma = np.zeros((2, 0, 0, len(self.metrics)))
+        self._sucio = None
+        self._tablas = {}
+
+    def __contains__(self, clave):
+        return clave in self._partes
+
+    def __len__(self):
+        return len(self._partes)
+
+    def update(self, frames):
+        """Sincroniza con `frames` (clave -> DataFrame o None si ya estaba incluido)."""
+        quitadas = [self._partes.pop(c) for c in set(self._partes).difference(frames)]
+        if quitadas:
+            self._add(pd.concat(quitadas), -1.0)
+        nuevas = {c: df for c, df in frames.items() if c not in self._partes and df is not None}
+        if nuevas:
+            # Un solo groupby para todos los archivos nuevos (p. ej. al abrir una temporada entera)
+            diarias = daily_loads(concat_frames(list(nuevas.values())), self.metrics)
+            for clave in nuevas:
+                self._partes[clave] = diarias.iloc[:0].droplevel(0)
+            for clave, parte in diarias.groupby(level=0, observed=True, sort=False):
+                self._partes[clave] = parte.droplevel(0)
+            self._add(diarias.droplevel(0), 1.0)
+
+    def _grow(self, fechas, jugadores):
+        """Amplía el calendario para cubrir `fechas` y `jugadores`."""
+        nuevos = [j for j in jugadores if j not in self._jugadores]
+        for j in nuevos:
+            self._jugadores[j] = len(self._jugadores)
+        if nuevos:
+            self._carga = np.pad(self._carga, ((0, 0), (0, len(nuevos)), (0, 0)))
+            self._acumulado = np.pad(self._acumulado, ((0, 0), (0, len(nuevos)), (0, 0)))
+            self._ewma = np.pad(self._ewma, ((0, 0), (0, 0), (0, len(nuevos)), (0, 0)))
+
+        inicio, fin = fechas.min(), fechas.max()
+        if self._inicio is None:
+            self._inicio = inicio
+        antes = max((self._inicio - inicio).days, 0)
+        despues = max((fin - self._inicio).days + antes + 1 - len(self._carga), 0)
+        if antes:
+            # Un archivo anterior al inicio desplaza todo el calendario: se recalcula entero
+            self._inicio = inicio
+            self._sucio = 0
+        if antes or despues:
+            # Se reserva de más al final para no copiar el calendario en cada partido
+            extra = max(despues, len(self._carga) // 2) if despues else 0
+            self._carga = np.pad(self._carga, ((antes, extra), (0, 0), (0, 0)))
+            self._acumulado = np.pad(self._acumulado, ((antes, extra), (0, 0), (0, 0)))
+            self._ewma = np.pad(self._ewma, ((0, 0), (antes, extra), (0, 0), (0, 0)))
+            self._fin += antes
+        nuevo_fin = (fin - self._inicio).days
+        if nuevo_fin > self._fin:
+            # Los días sin carga entre el último calculado y la fecha nueva también decaen
+            desde = self._fin + 1
+            self._sucio = desde if self._sucio is None else min(self._sucio, desde)
+            self._fin = nuevo_fin
+
+    def _add(self, diarias, signo):
+        if diarias.empty:
+            return
+        fechas = diarias.index.get_level_values('Fecha')
+        jugadores = diarias.index.get_level_values('Player Name').astype(str)
+        self._grow(fechas, list(dict.fromkeys(jugadores)))
+        dias = (fechas - self._inicio).days.to_numpy()
+        columnas = np.array([self._jugadores[j] for j in jugadores])
+        np.add.at(self._carga, (dias, columnas), signo * diarias.to_numpy())
+        primero = int(dias.min())
+        self._sucio = primero if self._sucio is None else min(self._sucio, primero)
+        self._tablas = {}
+
+    def _refresh(self):
+        """Recalcula acumulados y EWMA desde el primer día modificado."""
+        if self._sucio is None:
+            return
+        desde, hasta = self._sucio, self._fin + 1
+        np.cumsum(self._carga[desde:hasta], axis=0, out=self._acumulado[desde + 1:hasta + 1])
+        self._acumulado[desde + 1:hasta + 1] += self._acumulado[desde]
+
+        lambdas = self.lambdas[:, None, None]
+        previo = self._ewma[:, desde - 1] if desde else np.zeros_like(self._ewma[:, 0])
+        # La recurrencia es secuencial en días pero vectorizada en jugadores y métricas
+        for dia in range(desde, hasta):
+            previo = lambdas * self._carga[dia] + (1 - lambdas) * previo
+            self._ewma[:, dia] = previo
+        self._sucio = None
+
+    def table(self, method='ewma'):
+        """ACWR de todos los jugadores en todos los días del calendario.
+
+        Devuelve un DataFrame indexado por (Fecha, Player Name) con columnas
+        (métrica, campo), campos `carga`, `aguda`, `cronica` y `acwr`.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Método desconocido: {method}")
+        self._refresh()
+        if method in self._tablas:
+            return self._tablas[method]
+
+        dias = self._fin + 1 if self._inicio is not None else 0
+        carga = self._carga[:dias]
+        if method == 'ewma':
+            aguda, cronica = self._ewma[0, :dias], self._ewma[1, :dias]
+        else:
+            acumulado = self._acumulado[:dias + 1]
+            aguda = self._window_mean(acumulado, self.acute)
+            cronica = self._window_mean(acumulado, self.chronic)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            acwr = np.where(cronica > 0, aguda / cronica, np.nan)
+
+        jugadores = list(self._jugadores)
+        fechas = pd.date_range(self._inicio, periods=dias, freq='D') if dias else pd.DatetimeIndex([])
+        indice = pd.MultiIndex.from_product([fechas, jugadores], names=['Fecha', 'Player Name'])
+        valores = np.stack([carga, aguda, cronica, acwr], axis=-1).reshape(dias * len(jugadores), -1)
+        columnas = pd.MultiIndex.from_product([self.metrics, FIELDS])
+        tabla = pd.DataFrame(valores, index=indice, columns=columnas)
+        self._tablas[method] = tabla
+        return tabla
+
+    @staticmethod
+    def _window_mean(acumulado, dias):
+        # Media de los últimos `dias` días (los días previos al calendario cuentan como 0)
+        desde = np.maximum(np.arange(1, len(acumulado)) - dias, 0)
+        return (acumulado[1:] - acumulado[desde]) / dias
+
+    def ratios(self, metric, method='ewma', jugador=TODOS):
+        """ACWR de una métrica como DataFrame fecha x jugador."""
+        serie = self.table(method)[(metric, 'acwr')].unstack('Player Name')
+        if jugador != TODOS:
+            serie = serie[[jugador]] if jugador in serie.columns else serie.iloc[:, :0]
+        return serie
+
+    def players(self):
+        return sorted(self._jugadores)